@@ -2,13 +2,13 @@ import os
 import re
 import time
 import glob
+import shlex
+import hashlib
 import yaml
 import shutil
 import pathlib
-import paramiko
 import requests
 from urllib.parse import urljoin
-from scp import SCPClient
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -18,6 +18,8 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 import runpy, pathlib
+
+import ssh_session
 # --- 콘솔 실시간 출력 보장 (ADD THIS BLOCK NEAR THE TOP) ---
 import sys, logging, builtins, functools, os
 
@@ -55,6 +57,30 @@ DOWNLOAD_DIR = r"C:\Users\ijlee\Downloads"
 CHROMEDRIVER_PATH = r"C:\Users\ijlee\AppData\Local\Programs\Python\chromedriver-win64\chromedriver.exe"
 CONFIG_YAML = str((pathlib.Path(__file__).parent / "config.yaml").resolve())
 REMOTE_DIR = "/root/patch_commonutil"
+SSH_CMD_TIMEOUT = 600        # 원격 명령 1개 전체 제한(초)
+INSTALL_TIMEOUT = 1800       # install.sh -upgrade 전체 제한(초)
+INSTALL_IDLE_TIMEOUT = 600   # install.sh 가 이 시간 동안 아무 출력이 없으면 멈춘 것으로 판단(초)
+STREAM_TIMEOUT = 1800        # 스트리밍 전송(다운로드+업로드+압축 해제) 전체 제한(초)
+VERSION_CMD = "cd /usr/local/apache/bin && ./version.sh"
+# 패치 파일 전달 방식
+#  - "local" : Chrome 다운로드(DOWNLOAD_DIR) → SFTP 업로드 → 원격 압축 해제
+#  - "stream": 로그인 쿠키로 받은 다운로드를 로컬 저장 없이 원격 tee | tar -xz 로 바로 흘려 보냄
+#              (다운로드/업로드/압축 해제가 동시에 진행, sha256 은 전송 중 계산 후 원격 파일과 대조)
+TRANSFER_MODE = "local"
+
+# 서비스 정지/설치/시작 뒤 준비 확인(고정 sleep 대신 조건 충족 즉시 다음 단계, 최대 deadline 초)
+WEB_PORT = 3443
+WEB_PROCESS = "org.apache.catalina.startup.Bootstrap"   # pnpweb(Tomcat) 프로세스
+READY_URL = f"https://127.0.0.1:{WEB_PORT}/saferuas/engineer"
+READY_LOG = ("/usr/local/apache/logs/catalina.out", r"Server startup in")
+STATS_STOP_WAIT = {"probes": [{"kind": "process_gone", "pattern": "pnp_statistics"}], "deadline": 30}
+WEB_STOP_WAIT = {"probes": [{"kind": "process_gone", "pattern": WEB_PROCESS},
+                            {"kind": "port_closed", "port": WEB_PORT}], "deadline": 60}
+# 다음 단계(pnpweb start)가 포트를 잡을 수 있어야 하므로 포트 닫힘 확인 + 설치 직후 정리 시간 하한(기존 고정 대기 3초)
+INSTALL_WAIT = {"probes": [{"kind": "port_closed", "port": WEB_PORT}], "min": 3, "deadline": 15}
+WEB_START_WAIT = {"probes": [{"kind": "port_open", "port": WEB_PORT},
+                             {"kind": "log_line", "path": READY_LOG[0], "pattern": READY_LOG[1]},
+                             {"kind": "http", "url": READY_URL, "status": 200}], "deadline": 180}
 # ==========================================================
 
 # 파일명 패턴 (버전 1~2자리 허용)
@@ -254,16 +280,23 @@ def selenium_cookies_to_requests(driver) -> requests.Session:
         sess.cookies.set(c["name"], c.get("value", ""), domain=domain, path=c.get("path", "/"))
     return sess
 
-def download_via_requests_with_cookies(session: requests.Session, attachment_href: str, referer: str, save_path: str):
+def open_attachment(session: requests.Session, attachment_href: str, referer: str):
+    """첨부 GET(stream). 반환: (응답, Content-Disposition 의 .tgz 파일명 | None)"""
     url = urljoin(BBS_BASE, attachment_href) if not attachment_href.lower().startswith("http") else attachment_href
     headers = {"Referer": referer, "User-Agent": "Mozilla/5.0"}
-    with session.get(url, headers=headers, stream=True, timeout=120, verify=False) as r:
-        r.raise_for_status()
-        disp = r.headers.get("Content-Disposition", "")
-        if "filename=" in disp and disp.count(".tgz") >= 1:
-            fn = disp.split("filename=")[-1].strip('"; ')
-            if fn:
-                save_path = os.path.join(os.path.dirname(save_path), fn)
+    r = session.get(url, headers=headers, stream=True, timeout=120, verify=False)
+    r.raise_for_status()
+    fn = None
+    disp = r.headers.get("Content-Disposition", "")
+    if "filename=" in disp and disp.count(".tgz") >= 1:
+        fn = disp.split("filename=")[-1].strip('"; ') or None
+    return r, fn
+
+def download_via_requests_with_cookies(session: requests.Session, attachment_href: str, referer: str, save_path: str):
+    r, fn = open_attachment(session, attachment_href, referer)
+    with r:
+        if fn:
+            save_path = os.path.join(os.path.dirname(save_path), fn)
         with open(save_path, "wb") as f:
             for chunk in r.iter_content(1024 * 1024):
                 if chunk:
@@ -271,27 +304,122 @@ def download_via_requests_with_cookies(session: requests.Session, attachment_hre
     return save_path
 
 
-def ssh_exec(ssh: paramiko.SSHClient, cmd: str, check=True):
-    stdin, stdout, stderr = ssh.exec_command(cmd)
-    out = stdout.read().decode("utf-8", errors="ignore")
-    err = stderr.read().decode("utf-8", errors="ignore")
-    rc = stdout.channel.recv_exit_status()
-    if check and rc != 0:
-        raise RuntimeError(f"Command failed (rc={rc}): {cmd}\nSTDOUT:\n{out}\nSTDERR:\n{err}")
-    return rc, out, err
-
-
-def ensure_scp(ssh: paramiko.SSHClient):
-    return SCPClient(ssh.get_transport())
+def stream_patch_to_server(ssh: dict, session: requests.Session, latest: dict, referer: str, remote_dir: str) -> str:
+    """
+    BBS 첨부를 로컬 디스크 없이 원격으로: requests 스트림 → SSH 채널 stdin →
+    remote_dir 에서 `tee <파일>.part | tar -xzf - -C <임시 디렉터리>` → 원격 sha256 을 전송 중 계산한 값과 대조.
+    일치할 때만 압축 해제 결과와 tgz 를 제자리로 옮긴다(불일치/실패 시 임시 결과 삭제).
+    반환: 원격 tgz 파일명
+    """
+    r, fn = open_attachment(session, latest["href"], referer)
+    with r:
+        fname = os.path.basename(fn or latest["filename"])
+        m = FNAME_RE.search(fname)
+        if not m or m.group(1) != latest["yyyymmdd"]:
+            # 로컬 모드의 재다운로드도 같은 링크를 다시 받으므로 동일하게 경고 후 진행
+            print(f"  - 경고: 받는 파일명이 최신 날짜와 불일치: {fname} (기대: {latest['yyyymmdd']}) → 그대로 진행")
+        total = int(r.headers.get("Content-Length") or 0)
+        h = hashlib.sha256()
+        st = {"bytes": 0, "next": 0.1}
+
+        def _chunks():
+            for chunk in r.iter_content(1024 * 1024):
+                if not chunk:
+                    continue
+                h.update(chunk)
+                st["bytes"] += len(chunk)
+                if total and st["bytes"] / total >= st["next"]:
+                    print(f"    | {st['bytes'] / total * 100:5.1f}% ({st['bytes'] / (1024 * 1024):.1f} / {total / (1024 * 1024):.1f} MB)")
+                    st["next"] = int(st["bytes"] / total * 10) / 10 + 0.1
+                yield chunk
+
+        q, part, stage = shlex.quote(fname), shlex.quote(fname + ".part"), shlex.quote(f".{fname}.stage")
+        cd = f"cd {shlex.quote(remote_dir)}"
+        script = (f"set -o pipefail; {cd} && rm -rf {stage} && mkdir {stage} && "
+                  f"tee {part} | tar -xzf - -C {stage} && sha256sum < {part}")
+        print(f"  - 스트리밍 전송: {fname} → {remote_dir}/ (tee + tar -xz, 검증 후 반영)")
+        t0 = time.time()
+        res = ssh_session.stream(ssh, f"bash -c {shlex.quote(script)}", stdin_data=_chunks(),
+                                 timeout=STREAM_TIMEOUT, idle_timeout=INSTALL_IDLE_TIMEOUT)
+    elapsed = time.time() - t0
+    digest = h.hexdigest()
+    discard = f"{cd} && rm -rf {stage} {part}"
+    if res["timed_out"] or res["rc"] != 0 or res["stdout"].split()[:1] != [digest]:
+        ssh_session.run(ssh, discard, timeout=SSH_CMD_TIMEOUT)
+        if res["timed_out"]:
+            raise TimeoutError(f"스트리밍 전송 제한 시간 초과({elapsed:.1f}s): {fname}\nSTDERR(tail):\n{res['stderr']}")
+        if res["rc"] != 0:
+            raise RuntimeError(f"Command failed (rc={res['rc']}): {script}\nSTDOUT:\n{res['stdout']}\nSTDERR:\n{res['stderr']}")
+        raise RuntimeError(f"스트리밍 전송 검증 실패(sha256 불일치): {fname}")
+    # 검증 통과 → 압축 해제 결과의 최상위 항목을 교체하고 tgz 이름 확정
+    commit = (f"{cd} && for e in {stage}/* {stage}/.[!.]* {stage}/..?*; do "
+              f"[ -e \"$e\" ] || continue; rm -rf -- \"${{e#{stage}/}}\" && mv -- \"$e\" . || exit 1; done && "
+              f"rmdir {stage} && mv -f {part} {q}")
+    rc, _, err = ssh_session.run(ssh, commit, timeout=SSH_CMD_TIMEOUT)
+    if rc != 0:
+        raise RuntimeError(f"Command failed (rc={rc}): {commit}\nSTDERR:\n{err}")
+    print(f"  - 스트리밍 완료: {st['bytes'] / (1024 * 1024):.2f} MB, {st['bytes'] / max(elapsed, 1e-6) / (1024 * 1024):.2f} MB/s, "
+          f"{elapsed:.1f}s (다운로드+업로드+압축 해제, sha256 {digest[:12]}… 검증)")
+    return fname
+
+
+def ssh_plan(ssh: dict, steps: list, timeout=SSH_CMD_TIMEOUT, idle_timeout=None):
+    """
+    steps 를 원격 로그인 셸 1개에서 순서대로 실행(채널 1개, bash -l 1회).
+    단계별 "log" 문구는 그 단계가 원격에서 시작될 때 출력 → 기존 진행 로그 순서 유지.
+    check 단계 실패 시 RuntimeError, 전체/무출력 시간 초과 시 TimeoutError. 반환: {단계 name: (rc, out, err)}
+    """
+    def _on_step(i, st):
+        if st.get("log"):
+            print(st["log"])
+
+    def _on_wait(i, st, r):
+        what = ", ".join(ssh_session.probe_desc(p) for p in st["wait"]["probes"])
+        if r["ready"]:
+            print(f"  - 준비 확인: {what} ({r['waited']:.1f}s)")
+        else:
+            print(f"  - [WARN] 준비 확인 시간 초과({st['wait']['deadline']}s): {what} → 계속 진행")
+    res = ssh_session.run_plan(ssh, steps, timeout=timeout, idle_timeout=idle_timeout,
+                               on_step=_on_step, on_wait=_on_wait)
+    done = {r["name"]: (r["rc"], r["stdout"], r["stderr"]) for r in res["results"]}
+    if res["timed_out"]:
+        kind = "전체" if res["timed_out"] == "wall" else "무출력"
+        last = res["results"][-1] if res["results"] else {"name": "-", "stderr": ""}
+        raise TimeoutError(f"Plan {kind} timeout ({res['elapsed']:.1f}s) at step '{last['name']}'\n"
+                           f"STDERR(tail):\n{last['stderr']}")
+    if res["failed"] is not None:
+        st, r = steps[res["failed"]], res["results"][res["failed"]]
+        raise RuntimeError(f"Command failed (rc={r['rc']}): {st['cmd']}\nSTDOUT:\n{r['stdout']}\nSTDERR:\n{r['stderr']}")
+    return done
+
+
+def upload_patch(ssh: dict, local_file: str, remote_dir: str) -> str:
+    """tgz 를 remote_dir 로 업로드(같은 파일이면 생략, 끊긴 업로드는 이어서). 원격 전체 경로 반환."""
+    remote_path = f"{remote_dir}/{os.path.basename(local_file)}"
+    step = {"next": 0.1}
+
+    def _progress(pos, total):
+        if total and pos / total >= step["next"]:
+            print(f"    | {pos / total * 100:5.1f}% ({pos / (1024 * 1024):.1f} / {total / (1024 * 1024):.1f} MB)")
+            step["next"] = int(pos / total * 10) / 10 + 0.1
+
+    print(f"  - 업로드: {local_file} → {remote_dir}/")
+    res = ssh_session.upload(ssh, local_file, remote_path, on_progress=_progress)
+    if res["action"] == "skip":
+        print(f"  - 업로드 생략: 서버에 같은 파일 있음 (sha256 {res['sha256'][:12]}…)")
+    else:
+        how = f"{res['offset'] / (1024 * 1024):.1f} MB 지점부터 이어서" if res["action"] == "resume" else "전체"
+        print(f"  - 업로드 완료({how}): {res['sent'] / (1024 * 1024):.2f} MB, "
+              f"{res['mbps']:.2f} MB/s, 총 {res['elapsed']:.1f}s (sha256 {res['sha256'][:12]}… 검증)")
+    return remote_path
 
 
 # ---------- 새로 추가: 버전 정보 조회 공용 함수 ----------
-def read_version_info(ssh: paramiko.SSHClient):
+def parse_version_info(out: str):
     """
     /usr/local/apache/bin/version.sh 실행 결과에서
     'Server version:'과 'JVM Version:' 두 줄을 파싱해 반환
     """
-    _, out, _ = ssh_exec(ssh, "bash -lc 'cd /usr/local/apache/bin && ./version.sh'", check=False)
     server_version = None
     jvm_version = None
     for line in out.splitlines():
@@ -418,21 +546,19 @@ def main():
     ssh_cfg = load_ssh_config(CONFIG_YAML)
 
     # 1) SSH 접속 & (패치 전) 현재 버전 출력
+    #    세션은 ssh_session 이 프로세스 전역으로 유지 → 뒤이어 runpy 로 도는 단계(err_log 등)도 재사용
     print(f"[LOG] [1/10] SSH 접속: {ssh_cfg['host']}:{ssh_cfg['port']} (user={ssh_cfg['username']})")
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(
-        ssh_cfg["host"],
-        port=int(ssh_cfg["port"]),
-        username=ssh_cfg["username"],
-        password=ssh_cfg["password"],
-        look_for_keys=False,
-        allow_agent=False
-    )
+    ssh = ssh_session.normalize_conf(ssh_cfg)
+    ssh_session.get_client(ssh)
 
     try:
-        print("[LOG] [2/10] (패치 전) 현재 버전 확인 (/usr/local/apache/bin/version.sh)")
-        before_server, before_jvm = read_version_info(ssh)
+        # 다운로드 전 원격 작업(버전 확인 + 업로드 디렉터리 준비)은 한 번에
+        pre = ssh_plan(ssh, [
+            {"name": "version", "cmd": VERSION_CMD, "check": False,
+             "log": "[LOG] [2/10] (패치 전) 현재 버전 확인 (/usr/local/apache/bin/version.sh)"},
+            {"name": "mkdir", "cmd": f"mkdir -p {REMOTE_DIR}"},
+        ])
+        before_server, before_jvm = parse_version_info(pre["version"][1])
         print("\n==== BEFORE ====")
         print(before_server)
         print(before_jvm)
@@ -447,7 +573,8 @@ def main():
             login_to_bbs(driver)
 
             # 3-1) 기존 파일 스태시
-            _ = move_old_downloads(DOWNLOAD_DIR)
+            if TRANSFER_MODE != "stream":
+                _ = move_old_downloads(DOWNLOAD_DIR)
 
             # === [변경] 첫 페이지 진입 후 '2' 페이지로 이동 ===
             driver.get(PAGE_URL)
@@ -459,38 +586,46 @@ def main():
             print(f"  - 최신판: {latest['filename']} (날짜: {latest['yyyymmdd']})")
             print(f"  - 링크: {latest['href'] or '(직접 다운로드 링크 아님)'}")
 
-            # 이하 동일 (클릭 → 새 탭 전환 → 다운로드 감지 or 쿠키 이관 직하 GET)
-            print(f"[LOG] [4/10] 다운로드 시작 (Chrome 자동 저장 폴더: {DOWNLOAD_DIR})")
-            start_time = time.time()
-            before_handles = set(driver.window_handles)
-            latest["elem"].click()
-
-            time.sleep(0.8)
-            after_handles = set(driver.window_handles)
-            new_handles = list(after_handles - before_handles)
-            if new_handles:
-                driver.switch_to.window(new_handles[-1])
-
-            try:
-                local_file = wait_for_actual_new_download(DOWNLOAD_DIR, start_time, timeout_sec=900)
-                print(f"  - 다운로드 완료(첫 시도): {os.path.basename(local_file)} ({os.path.getsize(local_file)/(1024*1024):.2f} MB)")
-            except TimeoutError:
-                print("  - 클릭 다운로드 감지 실패 → 쿠키 이관 후 직접 GET 재시도")
-                sess = selenium_cookies_to_requests(driver)
-                tentative = os.path.join(DOWNLOAD_DIR, latest["filename"])
-                # [변경] referer를 PAGE_URL 대신 현재 URL(driver.current_url)로
-                local_file = download_via_requests_with_cookies(sess, latest["href"], driver.current_url, tentative)
-                print(f"  - 직접 다운로드 완료: {os.path.basename(local_file)} ({os.path.getsize(local_file)/(1024*1024):.2f} MB)")
-
-            # 7) 파일명 검증(날짜 불일치 시 재다운로드)
-            m_local = FNAME_RE.search(os.path.basename(local_file))
-            if not m_local or m_local.group(1) != latest["yyyymmdd"]:
-                print(f"  - 경고: 받은 파일명이 최신 날짜와 불일치 → 쿠키 이관 후 재다운로드 강제")
+            streamed_fname = None
+            if TRANSFER_MODE == "stream" and latest["href"]:
+                print("[LOG] [4/10] 스트리밍 전송 시작 (BBS → 서버, 로컬 저장 없음)")
                 sess = selenium_cookies_to_requests(driver)
-                tentative = os.path.join(DOWNLOAD_DIR, latest["filename"])
-                # [변경] referer를 현재 URL로 유지
-                local_file = download_via_requests_with_cookies(sess, latest["href"], driver.current_url, tentative)
-                print(f"  - 재다운로드 완료: {os.path.basename(local_file)} ({os.path.getsize(local_file)/(1024*1024):.2f} MB)")
+                streamed_fname = stream_patch_to_server(ssh, sess, latest, driver.current_url, REMOTE_DIR)
+            else:
+                if TRANSFER_MODE == "stream":
+                    print("  - [WARN] 직접 다운로드 링크가 없어 스트리밍 불가 → 로컬 다운로드로 진행")
+                # 이하 동일 (클릭 → 새 탭 전환 → 다운로드 감지 or 쿠키 이관 직하 GET)
+                print(f"[LOG] [4/10] 다운로드 시작 (Chrome 자동 저장 폴더: {DOWNLOAD_DIR})")
+                start_time = time.time()
+                before_handles = set(driver.window_handles)
+                latest["elem"].click()
+
+                time.sleep(0.8)
+                after_handles = set(driver.window_handles)
+                new_handles = list(after_handles - before_handles)
+                if new_handles:
+                    driver.switch_to.window(new_handles[-1])
+
+                try:
+                    local_file = wait_for_actual_new_download(DOWNLOAD_DIR, start_time, timeout_sec=900)
+                    print(f"  - 다운로드 완료(첫 시도): {os.path.basename(local_file)} ({os.path.getsize(local_file)/(1024*1024):.2f} MB)")
+                except TimeoutError:
+                    print("  - 클릭 다운로드 감지 실패 → 쿠키 이관 후 직접 GET 재시도")
+                    sess = selenium_cookies_to_requests(driver)
+                    tentative = os.path.join(DOWNLOAD_DIR, latest["filename"])
+                    # [변경] referer를 PAGE_URL 대신 현재 URL(driver.current_url)로
+                    local_file = download_via_requests_with_cookies(sess, latest["href"], driver.current_url, tentative)
+                    print(f"  - 직접 다운로드 완료: {os.path.basename(local_file)} ({os.path.getsize(local_file)/(1024*1024):.2f} MB)")
+
+                # 7) 파일명 검증(날짜 불일치 시 재다운로드)
+                m_local = FNAME_RE.search(os.path.basename(local_file))
+                if not m_local or m_local.group(1) != latest["yyyymmdd"]:
+                    print(f"  - 경고: 받은 파일명이 최신 날짜와 불일치 → 쿠키 이관 후 재다운로드 강제")
+                    sess = selenium_cookies_to_requests(driver)
+                    tentative = os.path.join(DOWNLOAD_DIR, latest["filename"])
+                    # [변경] referer를 현재 URL로 유지
+                    local_file = download_via_requests_with_cookies(sess, latest["href"], driver.current_url, tentative)
+                    print(f"  - 재다운로드 완료: {os.path.basename(local_file)} ({os.path.getsize(local_file)/(1024*1024):.2f} MB)")
 
         finally:
             try:
@@ -498,38 +633,33 @@ def main():
             except Exception:
                 pass
 
-        # 8) SSH 업로드/설치
-        print(f"[LOG] [5/10] 원격 디렉터리 준비 → {REMOTE_DIR}")
-        ssh_exec(ssh, f"mkdir -p {REMOTE_DIR}")
-
-        print(f"  - 업로드: {local_file} → {REMOTE_DIR}/")
-        with ensure_scp(ssh) as scp:
-            scp.put(local_file, remote_path=REMOTE_DIR + "/")
-
-        remote_fname = os.path.basename(local_file)
+        # 8) SSH 업로드/설치 (스트리밍이면 업로드와 압축 해제가 이미 끝남)
+        if streamed_fname:
+            remote_fname = streamed_fname
+        else:
+            print(f"[LOG] [5/10] 원격 디렉터리 준비 → {REMOTE_DIR}")
+            upload_patch(ssh, local_file, REMOTE_DIR)
+            remote_fname = os.path.basename(local_file)
         stem = re.sub(r"\.tgz$", "", remote_fname, flags=re.IGNORECASE)
         extract_dir = f"{REMOTE_DIR}/{stem}"
 
-        print(f"  - 압축 해제: {remote_fname} → {extract_dir}")
-        ssh_exec(ssh, f"bash -lc 'cd {REMOTE_DIR} && tar -xzf {remote_fname}'")
-
-        print("[LOG] [6/10] 서비스 정지 (pnp_statistics, pnpweb)")
-        ssh_exec(ssh, "bash -lc 'cd /dbsafer && ./pnp_statistics stop || true'")
-        time.sleep(4)
-        ssh_exec(ssh, "bash -lc 'service pnpweb stop || true'")
-        time.sleep(5)
-
-        print("[LOG] [7/10] 설치 실행: source ./install.sh -upgrade")
-        ssh_exec(ssh, f"bash -lc 'cd {extract_dir} && source ./install.sh -upgrade'")
-        time.sleep(3)
-
-        print("[LOG] [8/10] 서비스 시작: pnpweb start")
-        ssh_exec(ssh, "bash -lc 'service pnpweb start || true'")
-        time.sleep(4)
-
-        # 9) (패치 후) 버전 재확인
-        print("[LOG] [9/10] (패치 후) 버전 확인 (/usr/local/apache/bin/version.sh)")
-        after_server, after_jvm = read_version_info(ssh)
+        # 압축 해제 ~ 패치 후 버전 확인까지 한 번에 (단계 사이 준비 확인도 원격에서 폴링)
+        steps = [] if streamed_fname else [
+            {"name": "extract", "cmd": f"cd {REMOTE_DIR} && tar -xzf {remote_fname}",
+             "log": f"  - 압축 해제: {remote_fname} → {extract_dir}"},
+        ]
+        post = ssh_plan(ssh, steps + [
+            {"name": "stats_stop", "cmd": "cd /dbsafer && ./pnp_statistics stop || true", "wait": STATS_STOP_WAIT,
+             "log": "[LOG] [6/10] 서비스 정지 (pnp_statistics, pnpweb)"},
+            {"name": "web_stop", "cmd": "service pnpweb stop || true", "wait": WEB_STOP_WAIT},
+            {"name": "install", "cmd": f"cd {extract_dir} && source ./install.sh -upgrade", "echo": True,
+             "wait": INSTALL_WAIT, "log": "[LOG] [7/10] 설치 실행: source ./install.sh -upgrade"},
+            {"name": "web_start", "cmd": "service pnpweb start || true", "wait": WEB_START_WAIT,
+             "log": "[LOG] [8/10] 서비스 시작: pnpweb start"},
+            {"name": "version", "cmd": VERSION_CMD, "check": False,
+             "log": "[LOG] [9/10] (패치 후) 버전 확인 (/usr/local/apache/bin/version.sh)"},
+        ], timeout=INSTALL_TIMEOUT + SSH_CMD_TIMEOUT, idle_timeout=INSTALL_IDLE_TIMEOUT)
+        after_server, after_jvm = parse_version_info(post["version"][1])
 
         # 10) 결과 출력
         print("\n==== RESULT (AFTER) ====")
@@ -539,7 +669,8 @@ def main():
         print("[LOG] COMMON_UTIL 패치 완료")
 
     finally:
-        ssh.close()
+        for line in ssh_session.session_report():
+            print(line)
 
 
 if __name__ == "__main__":
@@ -11,11 +11,23 @@ log_collect_check_gemini_clean_v2.py
 
 import os
 import re
+import json
+import hashlib
 import time
 import socket
+import sqlite3
+import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List
 
+import yaml
+try:
+    import numpy as np   # 에러율 시계열(급증 감지). 없으면 기존처럼 핵심 에러마다 AI 호출
+except ImportError:
+    np = None
 # ---- gRPC/absl 잡로그 억제 ----
 os.environ.setdefault("GRPC_VERBOSITY", "ERROR")
 os.environ.setdefault("GRPC_TRACE", "")
@@ -23,19 +35,21 @@ os.environ.setdefault("GLOG_minloglevel", "3")
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
 
 import paramiko
+import requests
+from requests.adapters import HTTPAdapter
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment
 import runpy, pathlib
+try:
+    import re._parser as _sre_parse, re._constants as _sre   # 3.11+
+except ImportError:
+    import sre_parse as _sre_parse, sre_constants as _sre
+
+import ssh_session
 
 # ======================= 사용자/환경 설정 =======================
-SSH_CONF = {
-    "host": "10.77.166.34",
-    "hostname": "10.77.166.34",
-    "port": 7795,
-    "username": "root",
-    "password": "Aegisqjrmcpr25!",
-}
+# SSH 접속 정보는 ssh_session.default_conf() 한 곳에서 (config.yaml ssh → config.py SSH_CONFIG)
 
 LOG_PATHS = [
     "/usr/local/apache/logs/saferuas/saferuas.log",
@@ -45,6 +59,45 @@ LOG_PATHS = [
 
 ]
 
+# ==== 수집 방식 ====
+# tail: 매번 tail -n TAIL_LINES / incremental: 지난 실행 이후 추가분만
+# remote_filter: 3분창 + 핵심 패턴 필터를 서버에서 수행해 매칭 라인과 최근 10줄만 수신
+# bisect: SFTP로 타임스탬프 이분 탐색 → 최근 N분 시작 오프셋부터만 읽음 (config.yaml analysis)
+# agent: log_agent.py 를 서버에서 실행(1회 exec로 전체 로그) → 분류/템플릿 집계된 JSON만 수신
+COLLECT_MODE = "incremental"
+TAIL_LINES = 2000
+INCR_BOOTSTRAP_BYTES = 2 * 1024 * 1024   # 커서가 없을 때(첫 실행) 읽을 꼬리 크기
+INCR_MAX_BYTES = 64 * 1024 * 1024        # 1회 최대 수집량 (초과 시 앞부분 건너뜀)
+INCR_CARRY_LINES = 10                    # 다음 실행의 recent_tail 용으로 보관할 직전 라인 수
+INCR_HEAD_BYTES = 4096                   # 파일 동일성 확인용 앞부분 해시 길이(copytruncate/inode 재사용 감지)
+
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".common_util_auto")
+CURSOR_STORE_PATH = os.path.join(STATE_DIR, "log_cursors.json")
+LOG_RESOLVE_PATH = os.path.join(STATE_DIR, "log_paths.json")   # 호스트별 로그 경로 선택 캐시
+LOG_RESOLVE_TTL = 24 * 3600   # 캐시된 경로 선택 유효 시간(초). inode 변경/파일 없음이면 즉시 무효
+
+COLLECT_WORKERS = 4   # 한 Transport 위 동시 채널 수 (sshd MaxSessions 기본 10 이내)
+
+BISECT_BLOCK = 8192             # 이분 탐색 1회 probe 시 읽는 바이트
+BISECT_PROBE_MAX = 64 * 1024    # 블록에 타임스탬프가 없을 때(긴 스택트레이스) 확장 상한
+
+AGENT_LOCAL_PATH = str(pathlib.Path(__file__).with_name("log_agent.py"))
+AGENT_REMOTE_TMPL = "/tmp/common_util_auto.XXXXXXXX"   # 실행마다 mktemp -d 로 만드는 서버측 에이전트 디렉터리
+AGENT_MAX_SAMPLES = 200     # 파일당 돌려받을 핵심 이벤트 원문 수(최근 것부터)
+AGENT_MAX_TEMPLATES = 50    # 파일당 돌려받을 템플릿 수
+
+EVENT_DB_PATH = os.path.join(STATE_DIR, "events.db")   # 분류된 이벤트 누적 저장소(SQLite)
+EVENT_DB_RETENTION_DAYS = 30    # 이보다 오래된 이벤트는 저장 시 삭제
+EVENT_DB_BATCH = 1000           # executemany 1회 묶음 크기
+
+RATE_SERIES_PATH = os.path.join(STATE_DIR, "rate_series.npz")   # 분당 에러 건수 시계열
+RATE_HISTORY_MINUTES = 7 * 24 * 60   # 시계열 보관 길이(분)
+RATE_MIN_HISTORY = 60                # 기준선으로 쓰려면 관측된 과거 분이 이만큼 필요
+RATE_SPIKE_Z = 4.0                   # 임계 = 중앙값 + Z * 1.4826 * MAD
+RATE_MIN_SIGMA = 1.0                 # MAD 가 0(평소 0건 등)일 때 쓰는 최소 분산(건/분)
+
+CONFIG_YAML = str((pathlib.Path(__file__).parent / "config.yaml").resolve())
+
 DESKTOP = os.path.join(os.path.expanduser("~"), "Desktop")
 EXCEL_PATH = os.path.join(DESKTOP, "COMMON_UTIL TCL V 2.5.7_20251024.xlsx")
 
@@ -66,6 +119,9 @@ CORE_ERROR_PATTERNS = [
     r"\bAddress already in use\b",
 ]
 
+# CORE_ERROR_PATTERNS 매칭 시 붙는 기본 태그 (config.yaml rules 항목과 같은 키 구성)
+CORE_RULE_DEFAULTS = {"category": "CORE", "severity": "MEDIUM", "action": "REPORT", "note": ""}
+
 # 로그 타임스탬프 포맷 후보
 TIMESTAMP_REGEXPS = [
     (re.compile(r"(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:,\d{1,3})?)"),
@@ -85,6 +141,16 @@ GEMINI_MODEL_PRIMARY = "gemini-2.5-flash"      # google-genai
 GEMINI_MODEL_FALLBACK = "gemini-2.0-flash-exp" # google-generativeai
 GEMINI_TIMEOUT = 60
 
+# ==== AI 병렬 호출 ====
+AI_MAX_PARALLEL = 4      # 동시에 진행할 파일별 AI 질의 수
+AI_HEDGE_DELAY = 5.0     # 주 백엔드가 이 시간 안에 답이 없으면 보조 백엔드도 동시에 시작(초)
+AI_RUN_BUDGET = 120.0    # 실행 전체 AI 대기 상한(초). 넘긴 파일은 로컬 요약으로 대체
+
+# ==== AI 답변 캐시 ====
+AI_CACHE_PATH = os.path.join(STATE_DIR, "ai_cache.json")
+AI_CACHE_TTL = 24 * 3600   # 초
+AI_CACHE_MAX = 500         # 최대 항목 수 (초과 시 가장 오래 안 쓴 것부터 제거)
+
 _GEMINI_SYSTEM = (
     "역할: 서버 로그 분석 보조자.\n"
     "규칙:\n"
@@ -98,19 +164,148 @@ _GEMINI_SYSTEM = (
     "[다음 조치] - ...\n"
 )
 
+# ======================= 설정 파일/핵심 에러 매처 =======================
+_CONFIG_CACHE: dict | None = None
+_CORE_MATCHER: dict | None = None
+
+def load_config(path: str = CONFIG_YAML) -> dict:
+    """config.yaml을 1회만 읽어 캐시. 파일이 없거나 깨져 있으면 빈 dict."""
+    global _CONFIG_CACHE
+    if _CONFIG_CACHE is None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _CONFIG_CACHE = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError):
+            _CONFIG_CACHE = {}
+    return _CONFIG_CACHE
+
+def _required_literals(items) -> list[str] | None:
+    """
+    파싱된 정규식에서 매칭 시 반드시 나오는 리터럴(casefold)을 뽑는다.
+    최상위 분기(a|b)면 분기마다 1개씩(그중 하나는 있어야 함), 하나라도 못 뽑으면 None(선필터 없음).
+    """
+    items = list(items)
+    if len(items) == 1 and items[0][0] is _sre.BRANCH:
+        out = []
+        for branch in items[0][1][1]:
+            lits = _required_literals(branch)
+            if not lits:
+                return None
+            out += lits
+        return out
+    best, run = "", []
+    for op, av in items + [(None, None)]:
+        if op is _sre.LITERAL:
+            run.append(chr(av))
+        elif op is not _sre.AT:   # \b ^ $ 는 폭 0 → 앞뒤 리터럴은 그대로 이어짐
+            cur = "".join(run).casefold()
+            if len(cur) > len(best):
+                best = cur
+            run = []
+    return [best] if best else None
+
+def build_core_matcher(rules: list[dict] | None = None) -> dict:
+    """
+    CORE_ERROR_PATTERNS + config.yaml rules 컴파일 + 규칙별 필수 리터럴(선필터) 추출.
+    - rules      : 규칙 목록. "literals" 중 하나가 라인(casefold)에 있을 때만 정규식 실행
+    - core_rules : CORE_ERROR_PATTERNS 쪽만 (기존 is_core_error 의미 유지)
+    - gate       : 전체 패턴 OR 결합 문자열 (서버측 grep 식 재료)
+    라인은 casefold 1회 + 부분 문자열 검사로 대부분 걸러지고, 정규식은 후보 규칙에만 1회씩 돈다.
+    """
+    compiled = []
+    for pat in CORE_ERROR_PATTERNS:
+        compiled.append({"pattern": pat, "regex": re.compile(pat, re.I), "core": True, **CORE_RULE_DEFAULTS})
+    for r in rules or []:
+        pat = (r or {}).get("pattern")
+        if not pat:
+            continue
+        try:
+            creg = re.compile(pat, re.I)
+        except re.error:
+            continue
+        compiled.append({
+            "pattern": pat, "regex": creg, "core": False,
+            "category": r.get("category", ""), "severity": r.get("severity", ""),
+            "action": r.get("action", ""), "note": r.get("note", ""),
+        })
+    for c in compiled:
+        c["literals"] = _required_literals(_sre_parse.parse(c["pattern"], re.I))
+    return {
+        "gate": "|".join(f"(?:{c['pattern']})" for c in compiled) or r"(?!x)x",
+        "core_rules": [c for c in compiled if c["core"]],
+        "rules": compiled,
+    }
+
+def get_core_matcher() -> dict:
+    global _CORE_MATCHER
+    if _CORE_MATCHER is None:
+        _CORE_MATCHER = build_core_matcher(load_config().get("rules") or [])
+    return _CORE_MATCHER
+
+def _rule_hits(text: str, rules: list[dict], first: bool = False) -> list[dict]:
+    folded = text.casefold()
+    hits = []
+    for r in rules:
+        lits = r["literals"]
+        if lits is not None and not any(l in folded for l in lits):
+            continue
+        if r["regex"].search(text):
+            hits.append(r)
+            if first:
+                break
+    return hits
+
+def match_core_rules(line: str, matcher: dict | None = None) -> list[dict]:
+    """리터럴 선필터를 통과한 규칙만 정규식 1회씩 검사해 매칭된 규칙 전부 반환."""
+    return _rule_hits(line, (matcher or get_core_matcher())["rules"])
+
+def matches_core(text: str, matcher: dict | None = None) -> bool:
+    """CORE_ERROR_PATTERNS 중 하나라도 매칭되면 True (첫 매칭에서 중단)."""
+    return bool(_rule_hits(text, (matcher or get_core_matcher())["core_rules"], first=True))
+
+# ===== config.yaml 규칙 엔진(noise_filter → keywords → rules) =====
+_RULE_ENGINE: dict | None = None
+
+def get_rule_engine() -> dict:
+    """config.yaml noise_filter / keywords / rules 를 1회 읽어 구성."""
+    global _RULE_ENGINE
+    if _RULE_ENGINE is None:
+        cfg = load_config()
+        nf = cfg.get("noise_filter") or {}
+        _RULE_ENGINE = {
+            "noise_enabled": bool(nf.get("enabled")),
+            "noise_words": [str(w) for w in (nf.get("require_level") or []) + (nf.get("keywords") or [])],
+            "require_hits": int(nf.get("require_hits") or 1),
+            "keywords": [str(k) for k in cfg.get("keywords") or []],
+            "matcher": get_core_matcher(),
+        }
+    return _RULE_ENGINE
+
+def passes_noise_filter(text: str, engine: dict | None = None) -> bool:
+    """레벨 단어/노이즈 키워드(부분 문자열)가 require_hits 개 이상이어야 에러 후보. 정규식 없음."""
+    eng = engine or get_rule_engine()
+    if not eng["noise_enabled"]:
+        return True
+    need = eng["require_hits"]
+    hits = 0
+    for w in eng["noise_words"]:
+        if w in text:
+            hits += 1
+            if hits >= need:
+                return True
+    return False
+
+def tag_event(text: str, engine: dict | None = None) -> list[dict]:
+    """keywords 부분 문자열 선필터 통과 시에만 rules 정규식 검사 → 매칭 규칙(category/severity/action)."""
+    eng = engine or get_rule_engine()
+    if eng["keywords"] and not any(k in text for k in eng["keywords"]):
+        return []
+    return [r for r in match_core_rules(text, eng["matcher"]) if not r["core"]]
+
 # ======================= 공통 유틸 =======================
-def connect_ssh() -> paramiko.SSHClient:
-    cli = paramiko.SSHClient()
-    cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    cli.connect(
-        hostname=SSH_CONF["hostname"],
-        port=SSH_CONF["port"],
-        username=SSH_CONF["username"],
-        password=SSH_CONF["password"],
-        timeout=15, banner_timeout=15, auth_timeout=15,
-        allow_agent=False, look_for_keys=False,
-    )
-    return cli
+def connect_ssh(conf: dict | None = None, timeout: float = 15) -> paramiko.SSHClient:
+    """ssh_session 공유 세션(patch 단계 등에서 이미 열린 Transport 재사용). 호출자는 close() 하지 않는다."""
+    return ssh_session.get_client(conf or ssh_session.default_conf(), timeout)
 
 def get_server_epoch(cli: paramiko.SSHClient) -> int:
     _, stdout, _ = cli.exec_command("date +%s")
@@ -123,11 +318,603 @@ def get_server_epoch(cli: paramiko.SSHClient) -> int:
 def shell_quote(s: str) -> str:
     return "'" + s.replace("'", "'\"'\"'") + "'"
 
-def tail_recent_lines(cli: paramiko.SSHClient, path: str, n: int = 2000) -> List[str]:
-    cmd = f"tail -n {n} {shell_quote(path)} 2>/dev/null"
+def tail_recent_lines(cli: paramiko.SSHClient, path: str, n: int = 2000) -> dict | None:
+    """
+    tail -n N 수집. 첫 줄로 "<inode> <size>" 를 함께 받아 빈 파일과 파일 없음(None)을 구분한다.
+    (빈 파일을 None 으로 돌려주면 로그 경로 캐시가 매 실행 무효화됨)
+    """
+    cmd = (f"f={shell_quote(path)}; set -- $(stat -L -c '%i %s' \"$f\" 2>/dev/null); "
+           f"[ -n \"$1\" ] || exit 3; echo \"$1 $2\"; tail -n {n} \"$f\" 2>/dev/null")
+    _, stdout, _ = cli.exec_command(cmd)
+    raw = stdout.read()
+    if stdout.channel.recv_exit_status() != 0 or b"\n" not in raw:
+        return None
+    header, data = raw.split(b"\n", 1)
+    ino, size = header.decode("ascii", "replace").split()
+    return {"lines": data.decode("utf-8", "replace").splitlines(), "context": [], "ino": ino, "size": int(size)}
+
+# ===== 병렬 수집 =====
+_NOTE_BUF = threading.local()
+
+def _note(msg: str):
+    """수집 단계 메시지. 병렬 수집 중에는 파일별로 모아 두었다가 원래 순서대로 출력."""
+    buf = getattr(_NOTE_BUF, "lines", None)
+    if buf is None:
+        print(msg)
+    else:
+        buf.append(msg)
+
+def _collect_with_notes(cli: paramiko.SSHClient, path: str, cursors: dict | None,
+                        server_now: datetime | None, hkey: str | None,
+                        mode: str | None = None) -> tuple[dict | None, List[str]]:
+    _NOTE_BUF.lines = []
+    try:
+        return collect_log(cli, path, cursors, server_now, hkey, mode), _NOTE_BUF.lines
+    except Exception as e:
+        _NOTE_BUF.lines.append(f"  - 수집 실패: {e}")
+        return None, _NOTE_BUF.lines
+    finally:
+        _NOTE_BUF.lines = None
+
+def collect_all(cli: paramiko.SSHClient, paths: List[str], cursors: dict | None,
+                workers: int = COLLECT_WORKERS,
+                hkey: str | None = None) -> tuple[int, List[tuple[dict | None, List[str]]]]:
+    """
+    connect_ssh 의 단일 Transport 위에 exec/SFTP 채널을 여러 개 열어 모든 로그와 서버 시각을 동시에 수집.
+    반환: (server_epoch, paths 순서대로 [(collected, notes)])
+    서버 시각이 수집 조건인 모드(remote_filter/bisect)는 시각을 먼저 받은 뒤 파일만 병렬.
+    agent 모드는 채널 1개(에이전트 1회 실행)로 전체 로그와 서버 시각을 함께 받는다.
+    """
+    if COLLECT_MODE == "agent":
+        return collect_via_agent(cli, paths, workers)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        if COLLECT_MODE in ("remote_filter", "bisect"):
+            server_epoch = get_server_epoch(cli)
+            server_now = datetime.fromtimestamp(server_epoch)
+            futs = [pool.submit(_collect_with_notes, cli, p, cursors, server_now, hkey) for p in paths]
+        else:
+            epoch_fut = pool.submit(get_server_epoch, cli)
+            futs = [pool.submit(_collect_with_notes, cli, p, cursors, None, hkey) for p in paths]
+            server_epoch = epoch_fut.result()
+        return server_epoch, [f.result() for f in futs]
+
+# ===== 증분 수집(파일별 커서) =====
+def host_key(conf: dict | None = None) -> str:
+    c = ssh_session.normalize_conf(conf or ssh_session.default_conf())
+    return f"{c['hostname']}:{c['port']}"
+
+def file_key(hkey: str, path: str) -> str:
+    """호스트별로 같은 경로가 다른 포맷일 수 있으므로 타임스탬프 고정 키는 host|path."""
+    return f"{hkey}|{path}"
+
+def load_cursor_store(path: str = CURSOR_STORE_PATH) -> dict:
+    """{host_key: {log_path: {"inode", "size", "offset", "carry"}}}"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_cursor_store(store: dict, path: str = CURSOR_STORE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def build_incremental_cmd(path: str, cur: dict | None,
+                          bootstrap: int = INCR_BOOTSTRAP_BYTES, max_bytes: int = INCR_MAX_BYTES) -> str:
+    """
+    stat → 오프셋 결정 → 추가분 전송을 원격 1회 실행으로 처리.
+    첫 줄: "<inode> <size> <offset> <head 길이> <head sha1>" / 이후: offset부터 size까지의 바이트.
+    inode 변경(logrotate), size < offset(truncate), 파일 앞부분 내용 변경(copytruncate 후 다시 커짐,
+    inode 재사용)이면 0부터 다시 읽는다.
+    """
+    ino = str(cur.get("inode", "")) if cur else ""
+    off = int(cur.get("offset", -1)) if cur else -1
+    head_len = int(cur.get("head_len", 0)) if cur else 0
+    same_head = ""
+    if head_len > 0:
+        same_head = (f" || [ \"$(head -c {head_len} \"$f\" 2>/dev/null | sha1sum | cut -c1-40)\" "
+                     f"!= {shell_quote(str(cur.get('head', '')))} ]")
+    return (
+        f"f={shell_quote(path)}; set -- $(stat -L -c '%i %s' \"$f\" 2>/dev/null); "
+        f"[ -n \"$1\" ] || exit 3; ino=$1; size=$2; off={off}; "
+        f"if [ \"$off\" -lt 0 ]; then off=$((size - {bootstrap})); "
+        f"elif [ \"$ino\" != {shell_quote(ino)} ] || [ \"$size\" -lt \"$off\" ]{same_head}; then off=0; fi; "
+        f"[ $((size - off)) -gt {max_bytes} ] && off=$((size - {max_bytes})); "
+        f"[ \"$off\" -lt 0 ] && off=0; "
+        f"hl=$((size < {INCR_HEAD_BYTES} ? size : {INCR_HEAD_BYTES})); "
+        f"echo \"$ino $size $off $hl $(head -c $hl \"$f\" 2>/dev/null | sha1sum | cut -c1-40)\"; "
+        f"tail -c +$((off + 1)) \"$f\" 2>/dev/null | head -c $((size - off))"
+    )
+
+def apply_incremental_chunk(path: str, cur: dict | None, header: str, data: bytes) -> tuple[dict, List[str]]:
+    """원격 응답(header+data)을 커서에 반영하고 새 완결 라인만 반환."""
+    ino, size, off, head_len, head = header.split()
+    size, off = int(size), int(off)
+    if cur and str(cur.get("inode")) != ino:
+        _note(f"  - 로그 로테이션 감지(inode {cur.get('inode')} → {ino}): 처음부터 읽음")
+    elif cur and size < int(cur.get("offset", 0)):
+        _note(f"  - 로그 truncate 감지({cur.get('offset')} → {size}B): 처음부터 읽음")
+    elif cur and off == 0 and int(cur.get("offset", 0)) > 0:
+        _note("  - 로그 앞부분 내용 변경 감지(copytruncate/inode 재사용): 처음부터 읽음")
+    # 커서 위치가 아닌 곳(첫 실행/상한 초과)에서 시작했으면 첫 조각은 잘린 줄
+    aligned = off == 0 or (cur is not None and off == int(cur.get("offset", -1)) and str(cur.get("inode")) == ino)
+    end = data.rfind(b"\n") + 1   # 마지막 개행까지만 소비(작성 중인 줄은 다음 실행에)
+    body = data[:end]
+    if not aligned:
+        cut = body.find(b"\n") + 1
+        body = body[cut:]
+    lines = body.decode("utf-8", "replace").splitlines()
+    carry = ((cur or {}).get("carry", []) + lines)[-INCR_CARRY_LINES:]
+    return {"inode": ino, "size": size, "offset": off + end, "head_len": int(head_len), "head": head,
+            "carry": carry}, lines
+
+def read_incremental(cli: paramiko.SSHClient, path: str, store: dict, hkey: str) -> dict | None:
+    """지난 실행 이후 추가된 라인만 수집. 파일이 없으면 None."""
+    per_host = store.setdefault(hkey, {})
+    cur = per_host.get(path)
+    _, stdout, _ = cli.exec_command(build_incremental_cmd(path, cur))
+    raw = stdout.read()
+    if stdout.channel.recv_exit_status() != 0 or b"\n" not in raw:
+        return None
+    header, data = raw.split(b"\n", 1)
+    context = list((cur or {}).get("carry", []))
+    new_cur, lines = apply_incremental_chunk(path, cur, header.decode("ascii", "replace"), data)
+    per_host[path] = new_cur
+    _note(f"  - 증분 수집: {len(data)}B, {len(lines)}줄 (offset {new_cur['offset']})")
+    return {"lines": lines, "context": context, "ino": new_cur["inode"]}
+
+# ===== 로그 경로 후보 해석(config.yaml logs) =====
+# 항목별 path + candidates 중 존재하고 가장 최근 수정된 파일 1개를 고른다(stat 1회로 전체 후보).
+# 선택은 호스트별로 캐시하고, 수집 중 파일 없음/inode 변경을 보면 무효화 → 다음 실행에 다시 stat.
+_LOG_PATH_LOCK = threading.Lock()
+_LOG_PATH_CACHE: dict = {"store": None}
+
+def log_specs() -> List[dict]:
+    """
+    [{"tag", "candidates"}] . LOG_PATHS 순서를 따르고, 경로가 config.yaml logs 항목의 후보면 그 항목으로 대체.
+    LOG_PATHS 에 없는 config 항목은 뒤에 추가.
+    """
+    specs, used = [], set()
+    cfg_specs = []
+    for ent in load_config().get("logs") or []:
+        cands = [c for c in [ent.get("path")] + list(ent.get("candidates") or []) if c]
+        if cands:
+            cfg_specs.append({"tag": ent.get("tag") or os.path.basename(cands[0]),
+                              "candidates": list(dict.fromkeys(cands))})
+    for path in LOG_PATHS:
+        spec = next((c for c in cfg_specs if path in c["candidates"]), None)
+        if spec is None:
+            spec = {"tag": os.path.basename(path), "candidates": [path]}
+        if spec["tag"] not in used:
+            used.add(spec["tag"])
+            specs.append(spec)
+    specs += [c for c in cfg_specs if c["tag"] not in used]
+    return specs
+
+def stat_candidates(cli: paramiko.SSHClient, paths: List[str]) -> dict:
+    """원격 stat 1회 → {경로: {"ino", "mtime"}} (없는 파일은 빠짐)."""
+    cmd = "stat -L -c '%i %Y %n' -- " + " ".join(shell_quote(p) for p in paths) + " 2>/dev/null; true"
     _, stdout, _ = cli.exec_command(cmd)
-    txt = stdout.read().decode("utf-8", "replace")
-    return txt.splitlines() if txt else []
+    found = {}
+    for line in stdout.read().decode("utf-8", "replace").splitlines():
+        parts = line.split(" ", 2)
+        if len(parts) == 3 and parts[0].isdigit():
+            found[parts[2]] = {"ino": parts[0], "mtime": int(parts[1])}
+    return found
+
+def _log_path_store() -> dict:
+    if _LOG_PATH_CACHE["store"] is None:
+        _LOG_PATH_CACHE["store"] = load_cursor_store(LOG_RESOLVE_PATH)   # 같은 JSON 저장 형식 재사용
+    return _LOG_PATH_CACHE["store"]
+
+def save_log_path_cache():
+    with _LOG_PATH_LOCK:
+        if _LOG_PATH_CACHE["store"] is not None:
+            save_cursor_store(_LOG_PATH_CACHE["store"], LOG_RESOLVE_PATH)
+
+def resolve_log_paths(cli: paramiko.SSHClient, hkey: str) -> List[str]:
+    """호스트에서 실제로 읽을 로그 경로 목록. 캐시가 유효하면 원격 호출 없음."""
+    specs = log_specs()
+    sig = hashlib.sha1(json.dumps(specs, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    with _LOG_PATH_LOCK:
+        ent = _log_path_store().get(hkey)
+    if ent and ent.get("sig") == sig and time.time() - ent.get("ts", 0) < LOG_RESOLVE_TTL:
+        _note(f"[LOG] 로그 경로: 캐시 사용 ({len(ent['chosen'])}/{len(specs)}개)")
+        return [c["path"] for c in ent["chosen"]]
+    found = stat_candidates(cli, [p for s in specs for p in s["candidates"]])
+    chosen = []
+    for spec in specs:
+        alive = [p for p in spec["candidates"] if p in found]
+        if not alive:
+            _note(f"[LOG] 로그 없음(건너뜀): {spec['tag']} ({', '.join(spec['candidates'])})")
+            continue
+        best = max(alive, key=lambda p: found[p]["mtime"])   # 동률이면 먼저 적힌 후보
+        if len(spec["candidates"]) > 1:
+            _note(f"[LOG] 로그 후보 선택: {spec['tag']} → {best}")
+        chosen.append({"tag": spec["tag"], "path": best, "ino": found[best]["ino"]})
+    with _LOG_PATH_LOCK:
+        _log_path_store()[hkey] = {"sig": sig, "ts": time.time(), "chosen": chosen}
+    return [c["path"] for c in chosen]
+
+def check_resolved_paths(hkey: str, paths: List[str], collected_all: List[tuple]):
+    """
+    수집 결과로 캐시 검증: 파일 없음 또는 inode 가 선택 당시와 다르면 이 호스트 캐시 삭제.
+    빈 파일(size 0)은 내용 지문이 없으므로 inode 만 같으면 그대로 둔다.
+    """
+    with _LOG_PATH_LOCK:
+        ent = _log_path_store().get(hkey)
+        if not ent:
+            return
+        inos = {c["path"]: c["ino"] for c in ent["chosen"]}
+        for path, (collected, _) in zip(paths, collected_all):
+            ino = (collected or {}).get("ino")
+            if collected is None or (ino is not None and str(ino) != inos.get(path)):
+                _log_path_store().pop(hkey, None)
+                _note(f"  - 로그 경로 캐시 무효화({path}: {'파일 없음' if collected is None else 'inode 변경'})")
+                return
+
+# ===== 서버측 3분창/핵심 패턴 필터 =====
+# parse_line_ts 의 정규식 순서/검증을 그대로 옮긴 awk + assemble_events 와 같은 이벤트 조립.
+# 타임스탬프 라인이 이벤트를 시작하고, 연속 라인(_CONT_RE)/타임스탬프 없는 라인은 직전 이벤트에 붙는다.
+# 키 "YYYYMMDDhhmmssffffff" < START 인 이벤트를 만나면 버퍼 초기화(로컬 역방향 스캔의 break 와 동일).
+# END 에서 창 안 이벤트를 1줄씩(라인 사이 \036) 출력 → grep 은 이벤트 전체에 적용 → tr 로 줄 복원.
+_REMOTE_WINDOW_AWK = r"""
+function dim(y, m) {
+  if (m == 2) return (y % 4 == 0 && (y % 100 != 0 || y % 400 == 0)) ? 29 : 28
+  return (m == 4 || m == 6 || m == 9 || m == 11) ? 30 : 31
+}
+function mk(y, mo, d, h, mi, s, f, vy) {
+  if (mo < 1 || mo > 12 || d < 1 || d > dim(vy, mo) || h > 23 || mi > 59 || s > 59) return ""
+  return sprintf("%04d%02d%02d%02d%02d%02d%s", y, mo, d, h, mi, s, f)
+}
+function frac(r, sep,   f, i) {
+  if (substr(r, 1, 1) != sep) return "000000"
+  f = ""
+  for (i = 2; i <= 4 && substr(r, i, 1) ~ /[0-9]/; i++) f = f substr(r, i, 1)
+  return substr(f "000000", 1, 6)
+}
+function ymd(t, f) {
+  return mk(substr(t, 1, 4) + 0, substr(t, 6, 2) + 0, substr(t, 9, 2) + 0,
+            substr(t, 12, 2) + 0, substr(t, 15, 2) + 0, substr(t, 18, 2) + 0, f, substr(t, 1, 4) + 0)
+}
+function tskey(line,   t, k, p, mon) {
+  if (match(line, /[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9][ T][0-9][0-9]:[0-9][0-9]:[0-9][0-9]/)) {
+    k = ymd(substr(line, RSTART, 19), frac(substr(line, RSTART + 19), ","))
+    if (k != "") return k
+  }
+  if (match(line, /[0-9][0-9][0-9][0-9]\/[0-9][0-9]\/[0-9][0-9][ T][0-9][0-9]:[0-9][0-9]:[0-9][0-9]/)) {
+    k = ymd(substr(line, RSTART, 19), "000000")
+    if (k != "") return k
+  }
+  if (match(line, /[A-Z][a-z][a-z][[:space:]]+[0-9][0-9]?[[:space:]]+[0-9][0-9]:[0-9][0-9]:[0-9][0-9]/)) {
+    split(substr(line, RSTART, RLENGTH), p, /[[:space:]]+/)
+    mon = MON[toupper(p[1])]
+    if (mon != "") {
+      k = mk(YEAR, mon, p[2] + 0, substr(p[3], 1, 2) + 0, substr(p[3], 4, 2) + 0, substr(p[3], 7, 2) + 0, "000000", 1900)
+      if (k != "") return k
+    }
+  }
+  if (match(line, /[0-9][0-9]-[A-Za-z][A-Za-z][A-Za-z]-[0-9][0-9][0-9][0-9][[:space:]]+[0-9][0-9]:[0-9][0-9]:[0-9][0-9]/)) {
+    t = substr(line, RSTART, RLENGTH)
+    split(t, p, /[[:space:]]+/)
+    mon = MON[toupper(substr(p[1], 4, 3))]
+    if (mon != "") {
+      k = mk(substr(p[1], 8, 4) + 0, mon, substr(p[1], 1, 2) + 0, substr(p[2], 1, 2) + 0,
+             substr(p[2], 4, 2) + 0, substr(p[2], 7, 2) + 0, frac(substr(line, RSTART + RLENGTH), "."),
+             substr(p[1], 8, 4) + 0)
+      if (k != "") return k
+    }
+  }
+  return ""
+}
+BEGIN { split("JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC", M, " "); for (i = 1; i <= 12; i++) MON[M[i]] = i; n = 0; keep = 0 }
+{
+  k = ($0 ~ /^[[:space:]]+at[[:space:]]|^[[:space:]]*Caused by:|^[[:space:]]*Suppressed:|^[[:space:]]*\.\.\. [0-9]+ (more|common frames omitted)/) ? "" : tskey($0)
+  if (k == "") { if (keep) cur = cur "\036" $0; next }
+  if (keep) buf[++n] = cur
+  if ((k "") < (START "")) { n = 0; keep = 0; next }
+  cur = $0; keep = 1
+}
+END { if (keep) buf[++n] = cur; for (i = 1; i <= n; i++) print buf[i] }
+"""
+
+_RF_TAIL_MARK = "@@ERR_LOG_TAIL@@"
+_RF_HITS_MARK = "@@ERR_LOG_HITS@@"
+
+def ts_key(dt: datetime) -> str:
+    return dt.strftime("%Y%m%d%H%M%S") + f"{dt.microsecond:06d}"
+
+def remote_filter_pattern(engine: dict | None = None) -> str:
+    """
+    서버측 grep -P 식: 핵심 패턴 + config rules(둘 다 core 판정 근거) + noise_filter 단어(켜져 있을 때).
+    로컬 판정보다 넓게만 거르고, noise_filter/keywords/rules 최종 판정은 수신 후 로컬에서 그대로 한다.
+    """
+    eng = engine or get_rule_engine()
+    parts = [eng["matcher"]["gate"]]
+    if eng["noise_enabled"]:
+        parts += [re.escape(w) for w in eng["noise_words"] if w]
+    return "|".join(f"(?:{p})" for p in parts)
+
+def build_remote_filter_cmd(path: str, window_start: datetime, year: int, n: int = TAIL_LINES) -> str:
+    """
+    tail -n N 을 서버에서 두 번 읽어 (최근 10줄) + (awk 3분창 이벤트 조립 | grep -P 핵심/규칙 패턴) 만 출력.
+    패턴은 이벤트 전체(연속 라인 포함)에 적용하고, 통과한 이벤트는 연속 라인까지 그대로 보낸다.
+    """
+    combined = remote_filter_pattern()
+    src = f"tail -n {n} \"$f\" 2>/dev/null"
+    return (
+        f"f={shell_quote(path)}; [ -r \"$f\" ] || exit 3; "
+        f"echo {_RF_TAIL_MARK}; {src} | tail -n 10; "
+        f"echo {_RF_HITS_MARK}; h=$({src} | awk -v START={ts_key(window_start)} -v YEAR={year} "
+        f"{shell_quote(_REMOTE_WINDOW_AWK)} | grep -aiP -e {shell_quote(combined)}); rc=$?; "
+        f"[ -n \"$h\" ] && printf '%s\\n' \"$h\" | tr '\\036' '\\n'; "
+        f"[ $rc -le 1 ] || exit 4"
+    )
+
+def read_remote_filtered(cli: paramiko.SSHClient, path: str, server_now: datetime) -> dict | None:
+    """
+    서버측 필터 결과 수신. 파일 없음이면 None.
+    grep -P/awk 미지원 등으로 실패하면 로컬 경로(tail)로 대체.
+    """
+    window_start = server_now - timedelta(seconds=WINDOW_SECONDS)
+    _, stdout, _ = cli.exec_command(build_remote_filter_cmd(path, window_start, server_now.year))
+    raw = stdout.read()
+    rc = stdout.channel.recv_exit_status()
+    if rc == 3:
+        return None
+    txt = raw.decode("utf-8", "replace")
+    if rc != 0 or _RF_HITS_MARK not in txt:
+        _note(f"  - 서버측 필터 실패(rc={rc}) → 로컬 필터로 대체")
+        return tail_recent_lines(cli, path, n=TAIL_LINES)
+    tail_part, hits_part = txt.split(_RF_HITS_MARK + "\n", 1)
+    tail_part = tail_part.split(_RF_TAIL_MARK + "\n", 1)[-1]
+    recent = tail_part.splitlines()
+    hits = hits_part.splitlines()
+    _note(f"  - 서버측 필터 수신: {len(raw)}B (핵심 {len(hits)}줄 + 최근 {len(recent)}줄)")
+    return {"lines": hits, "context": [], "recent": recent}
+
+# ===== 타임스탬프 이분 탐색(SFTP) =====
+def analysis_settings() -> tuple[int, int]:
+    """config.yaml analysis → (창 길이 초, 파일당 최대 라인 수)."""
+    an = load_config().get("analysis") or {}
+    minutes = an.get("recent_minutes")
+    window = int(minutes * 60) if minutes else WINDOW_SECONDS
+    return window, int(an.get("max_lines_per_file") or TAIL_LINES)
+
+def _first_ts_at(f, offset: int, key: str, server_now: datetime) -> datetime | None:
+    """offset 이후 첫 완결 라인부터 타임스탬프를 찾는다. 없으면 블록을 키워 재시도."""
+    size = BISECT_BLOCK
+    while True:
+        f.seek(offset)
+        data = f.read(size)
+        if not data:
+            return None
+        body = data
+        if offset > 0:
+            nl = data.find(b"\n")
+            body = data[nl + 1:] if nl >= 0 else b""
+        parts = body.split(b"\n")
+        if len(data) == size:
+            parts = parts[:-1]   # 블록 끝 조각은 잘린 줄일 수 있음
+        for raw in parts:
+            dt = parse_line_ts_pinned(key, raw.decode("utf-8", "replace"), server_now)
+            if dt is not None:
+                return dt
+        if len(data) < size or size >= BISECT_PROBE_MAX:
+            return None
+        size *= 2
+
+def locate_window_offset(f, file_size: int, window_start: datetime, key: str,
+                         server_now: datetime) -> tuple[int, int]:
+    """
+    바이트 오프셋 이분 탐색. 반환 (시작 오프셋, probe 횟수).
+    불변식: lo 이후 첫 라인은 window_start 이전(또는 lo=0), hi 는 창 안/EOF.
+    타임스탬프를 못 찾은 probe 는 창 안으로 간주(더 많이 읽는 쪽으로 보수적).
+    """
+    lo, hi, probes = 0, file_size, 0
+    while hi - lo > BISECT_BLOCK:
+        mid = (lo + hi) // 2
+        dt = _first_ts_at(f, mid, key, server_now)
+        probes += 1
+        if dt is not None and dt < window_start:
+            lo = mid
+        else:
+            hi = mid
+    return lo, probes
+
+def read_window_bisect(cli: paramiko.SSHClient, path: str, server_now: datetime,
+                       fkey: str | None = None) -> dict | None:
+    """최근 N분 시작 위치를 O(log 파일크기) probe 로 찾고, 그 이후 바이트만 읽는다."""
+    window, max_lines = analysis_settings()
+    # 메인 분석 창(WINDOW_SECONDS)보다 좁게 읽으면 결과가 달라지므로 큰 쪽 사용
+    window_start = server_now - timedelta(seconds=max(window, WINDOW_SECONDS))
+    sftp = cli.open_sftp()
+    try:
+        try:
+            file_size = sftp.stat(path).st_size
+            f = sftp.open(path, "rb")
+        except IOError:
+            return None
+        with f:
+            start, probes = locate_window_offset(f, file_size, window_start, fkey or path, server_now)
+            # 창이 비어도 recent_tail(10줄)은 채울 수 있게 마지막 블록은 항상 포함
+            start = max(0, min(start, file_size - BISECT_BLOCK))
+            f.seek(start)
+            f.prefetch(file_size)
+            data = f.read(file_size - start)
+    finally:
+        sftp.close()
+    if start > 0:
+        data = data[data.find(b"\n") + 1:]
+    lines = data.decode("utf-8", "replace").splitlines()[-max_lines:]
+    _note(f"  - 이분 탐색: {file_size}B 중 offset {start}부터 {len(data)}B 읽음 (probe {probes}회)")
+    return {"lines": lines, "context": [], "size": file_size}   # 빈 파일도 '있음'(None 은 파일 없음 전용)
+
+# ===== 원격 분류 에이전트(log_agent.py) =====
+_AGENT_VERIFY_RC = 97    # 올린 에이전트의 소유자/권한/sha256 검증 실패 → 실행 거부
+_AGENT_NOPY_RC = 98      # 서버에 python 없음
+_AGENT_SCRIPT: dict = {}
+
+def agent_script() -> tuple[bytes, str]:
+    """(에이전트 소스, sha256 hex). 서버에 올린 파일은 실행 전에 이 값으로 검증한다."""
+    if not _AGENT_SCRIPT:
+        with open(AGENT_LOCAL_PATH, "rb") as f:
+            data = f.read()
+        _AGENT_SCRIPT.update(data=data, digest=hashlib.sha256(data).hexdigest())
+    return _AGENT_SCRIPT["data"], _AGENT_SCRIPT["digest"]
+
+def agent_config(paths: List[str]) -> dict:
+    """에이전트에 stdin 으로 넘길 설정. 패턴/규칙은 로컬 분석과 같은 원본을 그대로 전달."""
+    window, max_lines = analysis_settings()
+    eng = get_rule_engine()
+    return {
+        "paths": list(paths),
+        "window": max(window, WINDOW_SECONDS),
+        "core_window": WINDOW_SECONDS,   # 템플릿/핵심 건수는 analyze_collected 의 판정 창과 같게
+        "max_lines": max_lines,
+        "recent_lines": 10,
+        "event_max_lines": EVENT_MAX_LINES,
+        "max_samples": AGENT_MAX_SAMPLES,
+        "max_templates": AGENT_MAX_TEMPLATES,
+        "ts_parsers": [[creg.pattern, fmts] for creg, fmts in TIMESTAMP_REGEXPS],
+        "cont_re": _CONT_RE.pattern,
+        "ts_token": _TS_TOKEN_RE.pattern,
+        "token_masks": [[creg.pattern, repl] for creg, repl in _TOKEN_MASKS],
+        "core_patterns": CORE_ERROR_PATTERNS,
+        "rules": [{"pattern": r["pattern"], "category": r["category"], "severity": r["severity"],
+                   "action": r["action"]}
+                  for r in eng["matcher"]["rules"] if not r["core"]],
+        "keywords": eng["keywords"],
+        "noise_enabled": eng["noise_enabled"],
+        "noise_words": eng["noise_words"],
+        "require_hits": eng["require_hits"],
+    }
+
+def make_agent_dir(cli: paramiko.SSHClient) -> str:
+    """서버에 이번 실행 전용 디렉터리(0700) 생성. 예측 가능한 고정 경로는 다른 계정이 미리 심어둘 수 있어 쓰지 않는다."""
+    _, stdout, stderr = cli.exec_command(f"umask 077; mktemp -d {shell_quote(AGENT_REMOTE_TMPL)}")
+    out = stdout.read().decode("utf-8", "replace").strip()
+    rc = stdout.channel.recv_exit_status()
+    if rc != 0 or not out.startswith("/"):
+        err = stderr.read().decode("utf-8", "replace").strip()
+        raise RuntimeError(f"에이전트 디렉터리 생성 실패 rc={rc} {err}".strip())
+    return out
+
+def upload_agent(cli: paramiko.SSHClient, data: bytes, remote: str):
+    """SFTP 로 에이전트 업로드(0600)."""
+    sftp = cli.open_sftp()
+    try:
+        with sftp.open(remote, "wb") as f:
+            f.write(data)
+        sftp.chmod(remote, 0o600)
+    finally:
+        sftp.close()
+
+def build_agent_cmd(d: str, digest: str) -> str:
+    """
+    검증 후 실행하는 원격 명령. 디렉터리/파일이 심볼릭 링크가 아니고 접속 계정(root) 소유,
+    디렉터리 0700, 파일 sha256 이 로컬 log_agent.py 와 같을 때만 실행한다.
+    exec 하지 않고 끝날 때 trap 으로 디렉터리를 지운다.
+    """
+    return (f"d={shell_quote(d)}; f=\"$d/log_agent.py\"; trap 'rm -rf -- \"$d\"' EXIT; u=$(id -u); "
+            f"[ -d \"$d\" ] && [ ! -L \"$d\" ] && [ \"$(stat -c %u:%a \"$d\")\" = \"$u:700\" ] "
+            f"&& [ -f \"$f\" ] && [ ! -L \"$f\" ] && [ \"$(stat -c %u \"$f\")\" = \"$u\" ] "
+            f"&& [ \"$(sha256sum \"$f\" | cut -d' ' -f1)\" = {digest} ] || exit {_AGENT_VERIFY_RC}; "
+            f"p=$(command -v python3 || command -v python) || exit {_AGENT_NOPY_RC}; \"$p\" \"$f\"")
+
+def run_remote_agent(cli: paramiko.SSHClient, paths: List[str]) -> tuple[dict, int]:
+    """
+    에이전트 1회 실행으로 전체 paths 분석. 반환 (결과 JSON, 수신 바이트).
+    실행마다 mktemp -d 디렉터리에 올리고 검증 후 실행, 끝나면 디렉터리 삭제. 실패 시 RuntimeError.
+    """
+    data, digest = agent_script()
+    d = make_agent_dir(cli)
+    ran = False
+    try:
+        upload_agent(cli, data, f"{d}/log_agent.py")
+        _note(f"  - 에이전트 업로드: {d}/log_agent.py ({len(data)}B, sha256 {digest[:16]})")
+        payload = json.dumps(agent_config(paths)).encode("utf-8")
+        stdin, stdout, stderr = cli.exec_command(build_agent_cmd(d, digest))
+        ran = True
+        stdin.write(payload)
+        stdin.channel.shutdown_write()
+        raw = stdout.read()
+        err = stderr.read().decode("utf-8", "replace").strip()
+        rc = stdout.channel.recv_exit_status()
+    finally:
+        if not ran:   # 실행까지 못 갔으면 trap 이 없으니 직접 정리
+            try:
+                cli.exec_command(f"rm -rf -- {shell_quote(d)}")[1].channel.recv_exit_status()
+            except Exception:
+                pass
+    if rc == _AGENT_VERIFY_RC:
+        raise RuntimeError("에이전트 검증 실패(소유자/권한/sha256 불일치) → 실행 거부")
+    if rc == _AGENT_NOPY_RC:
+        raise RuntimeError("서버에 python 없음")
+    if rc != 0:
+        raise RuntimeError(f"rc={rc} {err.splitlines()[-1] if err else ''}".strip())
+    try:
+        return json.loads(raw.decode("utf-8", "replace")), len(raw)
+    except ValueError as e:
+        raise RuntimeError(f"결과 JSON 해석 실패: {e}") from e
+
+def agent_collected(res: dict) -> tuple[dict | None, List[str]]:
+    """에이전트 파일 결과 1건 → (collect_log 형식 collected, 메시지)."""
+    if not res.get("exists"):
+        return None, []
+    if res.get("error"):
+        return None, [f"  - 에이전트 분석 실패: {res['error']}"]
+    cnt = res["counts"]
+    notes = [f"  - 에이전트: {res['size']}B 중 offset {res['offset']}부터 {res['lines']}줄 분석 "
+             f"(probe {res['probes']}회, {res['elapsed_ms']}ms)",
+             f"  - 이벤트 {cnt['events']}건 (창 안 {cnt['in_window']}건) → 핵심 {cnt['core']}건, "
+             f"템플릿 {len(res['templates'])}종"]
+    if cnt["core"] > len(res["samples"]):
+        notes.append(f"  - 핵심 원문은 최근 {len(res['samples'])}건만 수신 (건수/템플릿/에러율은 전체 기준)")
+    lines = [ln for text in res["samples"] for ln in text.split("\n")]
+    # samples 는 발췌용. 건수는 에이전트가 창 전체에서 센 templates / counts / minutes 를 그대로 쓴다
+    agent = {"core": cnt["core"], "templates": res["templates"], "minutes": res.get("minutes") or {}}
+    return {"lines": lines, "context": [], "recent": res["recent"], "since": res["since"],
+            "ino": res.get("ino"), "agent": agent}, notes
+
+def collect_via_agent(cli: paramiko.SSHClient, paths: List[str],
+                      workers: int) -> tuple[int, List[tuple[dict | None, List[str]]]]:
+    """에이전트 1회 exec 로 전체 수집. 실패하면 이분 탐색(SFTP) 수집으로 대체."""
+    t0 = time.time()
+    try:
+        out, nbytes = run_remote_agent(cli, paths)
+    except Exception as e:
+        print(f"[WARN] 원격 에이전트 실패({e}) → 이분 탐색 수집으로 대체")
+        server_epoch = get_server_epoch(cli)
+        server_now = datetime.fromtimestamp(server_epoch)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futs = [pool.submit(_collect_with_notes, cli, p, None, server_now, None, "bisect") for p in paths]
+            return server_epoch, [f.result() for f in futs]
+    print(f"[LOG] 원격 에이전트: 로그 {len(paths)}개 분석 결과 {nbytes}B 수신 ({time.time() - t0:.2f}s)")
+    by_path = {r["path"]: r for r in out["files"]}
+    return out["now"], [agent_collected(by_path.get(p, {})) for p in paths]
+
+def collect_log(cli: paramiko.SSHClient, path: str, cursors: dict | None,
+                server_now: datetime | None, hkey: str | None = None,
+                mode: str | None = None) -> dict | None:
+    """
+    COLLECT_MODE(또는 mode)에 따라 로그 수집.
+    반환: {"lines": 분석 대상 라인, "context": recent_tail 보충용 직전 라인,
+           "recent": (선택) 서버가 직접 준 최근 10줄} / 파일 없음이면 None
+    """
+    hkey = hkey or host_key()
+    mode = mode or COLLECT_MODE
+    if mode == "incremental" and cursors is not None:
+        return read_incremental(cli, path, cursors, hkey)
+    if mode == "remote_filter":
+        return read_remote_filtered(cli, path, server_now)
+    if mode == "bisect":
+        return read_window_bisect(cli, path, server_now, file_key(hkey, path))
+    return tail_recent_lines(cli, path, n=TAIL_LINES)
 
 def parse_line_ts(line: str, server_now: datetime) -> datetime | None:
     for creg, fmts in TIMESTAMP_REGEXPS:
@@ -145,29 +932,284 @@ def parse_line_ts(line: str, server_now: datetime) -> datetime | None:
                 continue
     return None
 
+# ===== 타임스탬프 포맷 학습(파일별 고정) =====
+TS_LEARN_LINES = 50  # 포맷 학습에 쓰는 선두 라인 수(타임스탬프 있는 라인 기준)
+
+_MONTHS = {m: i for i, m in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
+
+def _ms_to_us(line: str, i: int) -> int:
+    # ",221" / ".2" → strptime %f 와 동일하게 오른쪽 0 채움
+    j = i
+    while j < len(line) and j - i < 3 and line[j].isdigit():
+        j += 1
+    return int(line[i:j].ljust(6, "0")) if j > i else -1
+
+def _fast_ymd(line: str, off: int, year: int, sep: str, frac: str) -> datetime | None:
+    # YYYY-MM-DD HH:MM:SS(,mmm) / YYYY/MM/DD HH:MM:SS
+    t = line[off:off + 19]
+    if (len(t) != 19 or t[4] != sep or t[7] != sep or t[10] not in " T"
+            or t[13] != ":" or t[16] != ":"):
+        return None
+    digits = t[0:4] + t[5:7] + t[8:10] + t[11:13] + t[14:16] + t[17:19]
+    if not digits.isdigit():
+        return None
+    us = 0
+    if frac and line[off + 19:off + 20] == frac:
+        us = _ms_to_us(line, off + 20)
+        if us < 0:
+            us = 0
+    try:
+        return datetime(int(t[0:4]), int(t[5:7]), int(t[8:10]),
+                        int(t[11:13]), int(t[14:16]), int(t[17:19]), us)
+    except ValueError:
+        return None
+
+def _fast_syslog(line: str, off: int, year: int) -> datetime | None:
+    # "Sep  3 16:04:17" / "Sep 13 16:04:17" (고정 15자)
+    t = line[off:off + 15]
+    mon = _MONTHS.get(t[0:3])
+    if mon is None or len(t) != 15 or t[3] != " " or t[9] != ":" or t[12] != ":":
+        return None
+    day = t[4:6].lstrip()
+    hms = t[7:9] + t[10:12] + t[13:15]
+    if not (day.isdigit() and hms.isdigit()):
+        return None
+    try:
+        return datetime(year, mon, int(day), int(t[7:9]), int(t[10:12]), int(t[13:15]))
+    except ValueError:
+        return None
+
+def _fast_catalina(line: str, off: int, year: int) -> datetime | None:
+    # "30-Sep-2025 16:04:17.221"
+    t = line[off:off + 20]
+    if len(t) != 20 or t[2] != "-" or t[6] != "-" or t[11] != " " or t[14] != ":" or t[17] != ":":
+        return None
+    mon = _MONTHS.get(t[3:6].capitalize())
+    digits = t[0:2] + t[7:11] + t[12:14] + t[15:17] + t[18:20]
+    if mon is None or not digits.isdigit():
+        return None
+    us = 0
+    if line[off + 20:off + 21] == ".":
+        us = max(0, _ms_to_us(line, off + 21))
+    try:
+        return datetime(int(t[7:11]), mon, int(t[0:2]), int(t[12:14]), int(t[15:17]), int(t[18:20]), us)
+    except ValueError:
+        return None
+
+# 이름 → (위치 탐색 정규식, 고정 오프셋 파서)
+TS_FAST_FORMATS = {
+    "ymd_dash": (TIMESTAMP_REGEXPS[0][0], lambda ln, off, y: _fast_ymd(ln, off, y, "-", ",")),
+    "ymd_slash": (TIMESTAMP_REGEXPS[1][0], lambda ln, off, y: _fast_ymd(ln, off, y, "/", "")),
+    "syslog": (TIMESTAMP_REGEXPS[2][0], _fast_syslog),
+    "catalina": (TIMESTAMP_REGEXPS[3][0], _fast_catalina),
+}
+
+# 파일 키(host:path 등) → {"name", "offset"} / 학습 실패 시 None
+_TS_PINNED: dict[str, dict | None] = {}
+
+def learn_ts_format(lines: List[str], server_now: datetime, max_lines: int = TS_LEARN_LINES) -> dict | None:
+    """
+    선두 라인들에서 (포맷, 오프셋)을 투표로 결정.
+    고속 파서 결과가 기존 parse_line_ts 결과와 같을 때만 표를 준다.
+    """
+    votes: dict[tuple[str, int], int] = {}
+    seen = 0
+    for line in lines:
+        if seen >= max_lines:
+            break
+        ref = parse_line_ts(line, server_now)
+        if ref is None:
+            continue
+        seen += 1
+        for name, (creg, fast) in TS_FAST_FORMATS.items():
+            m = creg.search(line)
+            if m and fast(line, m.start("ts"), server_now.year) == ref:
+                key = (name, m.start("ts"))
+                votes[key] = votes.get(key, 0) + 1
+                break
+    if not votes:
+        return None
+    (name, off), cnt = max(votes.items(), key=lambda kv: kv[1])
+    if cnt * 2 < seen:
+        return None
+    return {"name": name, "offset": off}
+
+def pin_ts_format(key: str, lines: List[str], server_now: datetime) -> dict | None:
+    """파일별 포맷을 1회 학습해 고정. 이미 고정돼 있으면 그대로 반환."""
+    if _TS_PINNED.get(key) is None:
+        learned = learn_ts_format(lines, server_now)
+        if learned is not None:
+            _TS_PINNED[key] = learned
+    return _TS_PINNED.get(key)
+
+def parse_line_ts_pinned(key: str, line: str, server_now: datetime) -> datetime | None:
+    """고정 포맷 고속 경로 → 실패 시에만 parse_line_ts 일반 경로."""
+    fmt = _TS_PINNED.get(key)
+    if fmt is not None:
+        dt = TS_FAST_FORMATS[fmt["name"]][1](line, fmt["offset"], server_now.year)
+        if dt is not None:
+            return dt
+    return parse_line_ts(line, server_now)
+
 def is_core_error(line: str) -> bool:
-    for pat in CORE_ERROR_PATTERNS:
-        if re.search(pat, line, flags=re.IGNORECASE):
-            return True
-    return False
+    return matches_core(line)
+
+_NOT_INFO_RE = re.compile(r"\b(ERROR|SEVERE|FATAL|CRITICAL|EXCEPTION|WARN|WARNING|TRACEBACK)\b", re.I)
+_INFO_RE = re.compile(r"\bINFO\b|\[INFO ?\]", re.I)
 
 def is_all_info(lines: List[str]) -> bool:
     if not lines:
         return False
     joined = "\n".join(lines)
-    bad = re.search(r"\b(ERROR|SEVERE|FATAL|CRITICAL|EXCEPTION|WARN|WARNING|TRACEBACK)\b", joined, re.I)
+    bad = _NOT_INFO_RE.search(joined)
     if bad:
         return False
-    info_hits = len(re.findall(r"\bINFO\b|\[INFO ?\]", joined, re.I))
+    info_hits = len(_INFO_RE.findall(joined))
     return info_hits >= max(1, len(lines) // 3)
 
 def tail_has_core_keywords(lines: List[str]) -> bool:
     if not lines: return False
-    joined = "\n".join(lines)
-    for pat in CORE_ERROR_PATTERNS:
-        if re.search(pat, joined, re.I):
-            return True
-    return False
+    return matches_core("\n".join(lines))
+
+# ===== 멀티라인 이벤트(자바 스택트레이스) 조립 =====
+EVENT_MAX_LINES = 200      # 이벤트 1건에 보관할 최대 라인 수(나머지는 건수만)
+EVENT_PREVIEW_LINES = 6    # 엑셀/프롬프트에 쓰는 이벤트 요약 라인 수(헤더 포함)
+
+# _REMOTE_WINDOW_AWK 에 같은 식(ERE)이 있음 — 바꿀 때 함께 바꾼다
+_CONT_RE = re.compile(r"^\s+at\s|^\s*Caused by:|^\s*Suppressed:|^\s*\.\.\. \d+ (?:more|common frames omitted)")
+
+def assemble_events(lines: List[str], fkey: str, server_now: datetime) -> List[dict]:
+    """
+    라인 → 이벤트. 타임스탬프가 있는 라인이 새 이벤트를 시작하고,
+    연속 라인(at / Caused by: / ... N more)과 타임스탬프 없는 라인은 직전 이벤트에 합친다.
+    연속 라인은 타임스탬프 파싱도 건너뛴다.
+    반환: [{"ts": 첫 라인 시각 | None, "text": 합친 본문, "lines": 원본 라인 수}]
+    """
+    events: List[dict] = []
+    cur: dict | None = None
+    for line in lines:
+        dt = None if _CONT_RE.match(line) else parse_line_ts_pinned(fkey, line, server_now)
+        if dt is None and cur is not None:
+            if cur["lines"] < EVENT_MAX_LINES:
+                cur["buf"].append(line)
+            cur["lines"] += 1
+            continue
+        cur = {"ts": dt, "buf": [line], "lines": 1}
+        events.append(cur)
+    for ev in events:
+        ev["text"] = "\n".join(ev.pop("buf"))
+    return events
+
+def event_preview(ev: dict, max_lines: int = EVENT_PREVIEW_LINES) -> str:
+    """이벤트 앞부분 몇 줄 + 뒤쪽 Caused by: 라인 + 생략 줄 수."""
+    if ev["lines"] <= max_lines:
+        return ev["text"]
+    parts = ev["text"].split("\n")
+    causes = [ln for ln in parts[max_lines:] if ln.lstrip().startswith("Caused by:")]
+    omitted = ev["lines"] - max_lines - len(causes)
+    return "\n".join(parts[:max_lines] + causes) + f"\n    ... (+{omitted} lines)"
+
+# ===== 로그 템플릿 마이닝(Drain 방식 고정 깊이 파스 트리) =====
+TEMPLATE_DEPTH = 4            # 트리 깊이: 토큰 수 노드 + 선두 토큰 (DEPTH-2)개
+TEMPLATE_SIM = 0.5            # 클러스터 병합 유사도 임계값
+TEMPLATE_MAX_CHILDREN = 100   # 노드당 자식 수 상한 (초과분은 <*> 로 모음)
+TEMPLATE_MAX_CLUSTERS = 1000  # 클러스터 수 상한 (LRU 제거로 메모리 고정)
+TEMPLATE_MAX_EXAMPLES = 3     # 템플릿별 보관할 변수 예시 수
+
+_WILD = "<*>"
+_TS_TOKEN_RE = re.compile(
+    r"^\[?(?:\d{4}[-/]\d{2}[-/]\d{2}(?:T\S*)?|\d{2}:\d{2}:\d{2}(?:[.,]\d+)?|\d{2}-[A-Za-z]{3}-\d{4})\]?$")
+_TOKEN_MASKS = [
+    (re.compile(r"\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?"), "<IP>"),
+    (re.compile(r"(?i)\bORA-\d+"), "ORA-<NUM>"),
+    (re.compile(r"(?i)\b0x[0-9a-f]+\b|\b[0-9a-f]{8,}\b"), "<HEX>"),
+    (re.compile(r"\d+"), "<NUM>"),
+]
+
+def _mask_token(tok: str) -> str:
+    for creg, repl in _TOKEN_MASKS:
+        tok = creg.sub(repl, tok)
+    return tok
+
+def new_template_miner() -> dict:
+    return {"root": {}, "clusters": OrderedDict(), "next_id": 0}
+
+def _template_sim(tmpl: List[str], toks: List[str]) -> tuple[float, int]:
+    same = params = 0
+    for a, b in zip(tmpl, toks):
+        if a == _WILD:
+            params += 1
+        elif a == b:
+            same += 1
+    return same / len(tmpl), params
+
+def mine_template(miner: dict, text: str, sample: str | None = None) -> dict:
+    """
+    text(이벤트 서명) 1건을 트리에 넣고 속한 클러스터를 반환. 스트리밍 1패스.
+    타임스탬프 토큰은 버리고, 숫자/IP/HEX/ORA 코드는 토큰 단위로 마스킹 → 원래 값은 변수 예시로 보관.
+    """
+    raw = [t for t in text.split() if not _TS_TOKEN_RE.match(t)]   # 타임스탬프 토큰은 템플릿에서 제외
+    toks = [_mask_token(t) for t in raw]
+    # 1) 길이 노드 → 선두 토큰 노드들 → leaf(클러스터 id 목록)
+    node = miner["root"].setdefault(len(toks), {})
+    for tok in toks[:TEMPLATE_DEPTH - 2]:
+        key = _WILD if any(ch.isdigit() for ch in tok) or "<" in tok else tok
+        if key not in node and len(node) >= TEMPLATE_MAX_CHILDREN:
+            key = _WILD
+        node = node.setdefault(key, {})
+    leaf = node.setdefault("__leaf__", [])
+    # 2) leaf 안에서 가장 유사한 클러스터
+    best, best_key = None, (-1.0, -1)
+    for cid in leaf:
+        cl = miner["clusters"][cid]
+        key = _template_sim(cl["tokens"], toks) if toks else (1.0, 0)
+        if key > best_key:
+            best, best_key = cl, key
+    if best is None or best_key[0] < TEMPLATE_SIM:
+        cid = miner["next_id"]
+        miner["next_id"] += 1
+        best = {"id": cid, "tokens": list(toks), "count": 0, "examples": [],
+                "sample": sample if sample is not None else text, "leaf": leaf}
+        miner["clusters"][cid] = best
+        leaf.append(cid)
+        if len(miner["clusters"]) > TEMPLATE_MAX_CLUSTERS:
+            _, old = miner["clusters"].popitem(last=False)
+            old["leaf"].remove(old["id"])
+    else:
+        best["tokens"] = [a if a == b else _WILD for a, b in zip(best["tokens"], toks)]
+        miner["clusters"].move_to_end(best["id"])
+    best["count"] += 1
+    # 3) 변수 예시: 템플릿 와일드카드 자리 또는 마스킹된 토큰의 원래 값
+    if len(best["examples"]) < TEMPLATE_MAX_EXAMPLES:
+        var = tuple(r for r, m, t in zip(raw, toks, best["tokens"]) if t == _WILD or m != r)
+        if var and var not in best["examples"]:
+            best["examples"].append(var)
+    return best
+
+def event_signature(ev: dict) -> str:
+    """템플릿 키: 첫 줄 + (있으면) 첫 예외/Caused by 줄. at 프레임은 제외."""
+    parts = ev["text"].split("\n", 8)
+    sig = [parts[0]]
+    for ln in parts[1:]:
+        if not _CONT_RE.match(ln) or ln.lstrip().startswith("Caused by:"):
+            sig.append(ln.strip())
+            break
+    return " ".join(sig)
+
+def template_rows(miner: dict, limit: int = 20) -> List[str]:
+    """건수 내림차순 "[xN] 템플릿 (예: ...)". 1건짜리는 원문 요약을 그대로."""
+    clusters = sorted(miner["clusters"].values(), key=lambda c: -c["count"])
+    rows = []
+    for cl in clusters[:limit]:
+        if cl["count"] == 1:
+            rows.append(cl["sample"])
+            continue
+        row = f"[x{cl['count']}] " + " ".join(cl["tokens"])
+        if cl["examples"]:
+            row += "  (예: " + " / ".join(", ".join(v[:4]) for v in cl["examples"]) + ")"
+        rows.append(row)
+    return rows
 
 # ===== 프롬프트(깔끔) =====
 def build_prompt_for_ai(log_path: str, core_lines: list[str]) -> str:
@@ -179,65 +1221,426 @@ def build_prompt_from_tail(log_path: str, tail_lines: list[str]) -> str:
     return (f"로그 파일: {log_path}\n샘플:\n{sample}").strip()
 
 # ===== AI 출력 정리(초간결) =====
+_AI_DROP_RE = re.compile("|".join([
+    r"\bgrep\b", r"\bawk\b", r"\bsed\b", r"\bfind\b",
+    r"\bkibana\b", r"\belastic(search)?\b", r"\bsplunk\b", r"\bgraylog\b",
+    r"^\s*\$ ", r"^\s*# ", r"^\s*```", r"^\s*>>> ",
+]), re.I)
+_AI_LABELS = ("[상태]", "[의심 원인]", "[즉시 점검]", "[다음 조치]")
+_AI_ITEM_RE = re.compile(r"^(?:[-*•·]|\d+[.)])\s*")   # 항목 안 이어지는 줄(- 2번째 조치 등)
+
+def _finish_ai_lines(kept: List[str], max_lines: int, max_chars: int) -> str:
+    out = "\n".join(kept[:max_lines])
+    if len(out) > max_chars:
+        out = out[:max_chars].rstrip() + "…"
+    return out
+
 def _sanitize_ai_text(text: str, max_lines: int = 6, max_chars: int = 600) -> str:
     if not text:
         return ""
     text = re.sub(r"```.*?```", "", text, flags=re.S).replace("`", "")
-    drop_patterns = [
-        r"\bgrep\b", r"\bawk\b", r"\bsed\b", r"\bfind\b",
-        r"\bkibana\b", r"\belastic(search)?\b", r"\bsplunk\b", r"\bgraylog\b",
-        r"^\s*\$ ", r"^\s*# ", r"^\s*```", r"^\s*>>> ",
-    ]
     kept = []
     for ln in text.splitlines():
-        if any(re.search(p, ln, flags=re.I) for p in drop_patterns):
+        if _AI_DROP_RE.search(ln):
             continue
         ln = ln.strip()
         if ln:
             kept.append(ln)
-    lines = kept[:max_lines]
-    out = "\n".join(lines)
-    if len(out) > max_chars:
-        out = out[:max_chars].rstrip() + "…"
-    return out
+    return _finish_ai_lines(kept, max_lines, max_chars)
+
+def sanitize_ai_stream(chunks, max_lines: int = 6, max_chars: int = 600) -> str:
+    """
+    스트리밍 응답 조각을 받는 즉시 줄 단위로 정리(_sanitize_ai_text 와 같은 규칙).
+    4개 항목([상태]~[다음 조치])이 모두 나온 뒤 [다음 조치] 의 이어지는 줄("- ...")은 계속 받고,
+    새 항목/형식에서 벗어난 줄이 오거나 max_lines/max_chars 에 닿으면 나머지는 받지 않고 스트림을 닫는다.
+    """
+    kept: List[str] = []
+    seen: set = set()
+    st = {"code": False, "chars": 0}
+
+    def _take(ln: str) -> bool:
+        # ``` 코드블록은 여러 조각/줄에 걸쳐도 통째로 제외
+        out = ""
+        while ln:
+            i = ln.find("```")
+            if st["code"]:
+                if i < 0:
+                    ln = ""
+                else:
+                    st["code"], ln = False, ln[i + 3:]
+            elif i < 0:
+                out, ln = out + ln, ""
+            else:
+                out, st["code"], ln = out + ln[:i], True, ln[i + 3:]
+        ln = out.replace("`", "")
+        if not ln or _AI_DROP_RE.search(ln):
+            return False
+        ln = ln.strip()
+        if not ln:
+            return False
+        if len(seen) == len(_AI_LABELS) and not _AI_ITEM_RE.match(ln):
+            return True   # [다음 조치] 블록이 끝남 → 이 줄은 버리고 종료
+        kept.append(ln)
+        st["chars"] += len(ln) + 1
+        seen.update(lb for lb in _AI_LABELS if ln.startswith(lb))
+        return len(kept) >= max_lines or st["chars"] > max_chars
+
+    buf = ""
+    try:
+        for chunk in chunks:
+            buf += chunk or ""
+            *complete, buf = buf.split("\n")
+            for ln in complete:
+                if _take(ln):
+                    return _finish_ai_lines(kept, max_lines, max_chars)
+        if buf:
+            _take(buf)
+        return _finish_ai_lines(kept, max_lines, max_chars)
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+def _stream_texts(stream, cancel: threading.Event | None = None):
+    """SDK 스트림 → 텍스트 조각 제너레이터. 조기 종료(close)나 cancel 시 원 스트림(HTTP 연결)도 닫는다."""
+    try:
+        for part in stream:
+            if cancel is not None and cancel.is_set():
+                break
+            yield getattr(part, "text", "") or ""
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+
+# ===== AI 답변 캐시(정규화 지문 → 답변, TTL + LRU) =====
+_AI_CACHE_LOCK = threading.Lock()
+_AI_CACHE: dict = {"entries": None, "hits": 0, "misses": 0}
+
+# 매번 바뀌는 값만 지운다. ORA-00942 / HTTP 404 / errno / 예외 클래스명 같은 "에러를 구분하는 숫자"는 유지
+_FP_MASKS = [
+    re.compile(r"\[x\d+\] |  \(예: [^\n]*\)$", re.M),                                     # template_rows 건수/예시
+    re.compile(r"\d{4}[-/]\d{2}[-/]\d{2}[ T]?|\d{2}-[A-Za-z]{3}-\d{4}|\d{2}:\d{2}:\d{2}(?:[.,]\d+)?"),  # 시각
+    re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"),                                   # IP(:포트)
+    re.compile(r"(?i)\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b|"
+               r"\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*[a-f])(?=[0-9a-f]*\d)[0-9a-f]{8,}\b"),      # UUID / HEX id
+    re.compile(r"(?<![A-Za-z]-)\b\d{6,}\b"),                                              # 긴 카운터(pid, 건수, ms)
+]
+_FP_VERSION = "3"   # 지문 규칙이 바뀌면 올림 → 예전 규칙으로 만든 캐시 키와 섞이지 않음
+
+def ai_fingerprint(prompt: str) -> str:
+    """
+    프롬프트 문자열 지문(최근 10줄 기반 프롬프트용). 시각/IP/HEX id/긴 카운터와
+    템플릿 행의 [xN]/예시를 지우고 공백을 정리한 sha1. 같은 NPE/ORA 반복은 같은 지문.
+    """
+    text = prompt
+    for creg in _FP_MASKS:
+        text = creg.sub("#", text)
+    text = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(f"{_FP_VERSION}\n{text}".encode("utf-8")).hexdigest()
+
+# 템플릿은 ORA 코드/HTTP 상태까지 <NUM> 으로 접으므로, 에러를 구분하는 코드는 원문에서 따로 모아 키에 넣는다
+_FP_CODE_RE = re.compile(r"(?i)\bORA-\d{5}\b|\b(?:HTTP(?:/\d\.\d)?\s+(?:status\s+)?|status(?:\s+code)?\s*[=:]?\s*)([1-5]\d\d)\b")
+
+def error_codes(texts: List[str]) -> List[str]:
+    """원문들에 나온 ORA 코드 / HTTP 상태 코드 (정렬, 중복 제거)."""
+    codes = set()
+    for text in texts:
+        for m in _FP_CODE_RE.finditer(text):
+            codes.add(f"HTTP {m.group(1)}" if m.group(1) else m.group(0).upper())
+    return sorted(codes)
+
+def ai_template_key(log_path: str, templates: List[str], categories: List[str], codes: List[str]) -> str:
+    """
+    핵심 에러 프롬프트용 캐시 키: 템플릿(마스킹된 토큰) 집합 + 규칙 category + 에러 코드.
+    건수/변수 예시/원문 샘플은 넣지 않음 → 같은 사건이 반복되면 건수가 달라도 같은 키.
+    """
+    body = "\n".join([log_path, "|".join(sorted(set(categories))), "|".join(codes)] + sorted(set(templates)))
+    return hashlib.sha1(f"{_FP_VERSION}\ntemplates\n{body}".encode("utf-8")).hexdigest()
+
+def ai_row_key(row: dict) -> str:
+    return row.get("ai_key") or ai_fingerprint(row["ai_prompt"])
+
+def _ai_cache_entries() -> OrderedDict:
+    if _AI_CACHE["entries"] is None:
+        entries = OrderedDict()
+        try:
+            with open(AI_CACHE_PATH, "r", encoding="utf-8") as f:
+                for fp, ent in json.load(f):
+                    entries[fp] = ent
+        except (OSError, ValueError, TypeError):
+            pass
+        _AI_CACHE["entries"] = entries
+    return _AI_CACHE["entries"]
+
+def _ai_cache_save(entries: OrderedDict):
+    os.makedirs(os.path.dirname(AI_CACHE_PATH), exist_ok=True)
+    tmp = AI_CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(list(entries.items()), f, ensure_ascii=False)
+    os.replace(tmp, AI_CACHE_PATH)
+
+def ai_cache_get(fp: str) -> str | None:
+    with _AI_CACHE_LOCK:
+        entries = _ai_cache_entries()
+        ent = entries.get(fp)
+        if ent is not None and time.time() - ent["ts"] > AI_CACHE_TTL:
+            del entries[fp]
+            ent = None
+        if ent is None:
+            _AI_CACHE["misses"] += 1
+            return None
+        entries.move_to_end(fp)
+        _AI_CACHE["hits"] += 1
+        return ent["answer"]
+
+def ai_cache_put(fp: str, answer: str):
+    with _AI_CACHE_LOCK:
+        entries = _ai_cache_entries()
+        entries[fp] = {"answer": answer, "ts": time.time()}
+        entries.move_to_end(fp)
+        while len(entries) > AI_CACHE_MAX:
+            entries.popitem(last=False)
+        _ai_cache_save(entries)
+
+def ai_cache_stats() -> dict:
+    with _AI_CACHE_LOCK:
+        hits, misses = _AI_CACHE["hits"], _AI_CACHE["misses"]
+        size = len(_AI_CACHE["entries"] or ())
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "size": size,
+            "hit_rate": f"{hits / total * 100:.0f}%" if total else "-"}
 
 # ===== Gemini 호출 =====
-def ask_ai(prompt: str) -> str:
-    key = (os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or FALLBACK_GOOGLE_API_KEY).strip()
+def _gemini_key() -> str:
+    return (os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or FALLBACK_GOOGLE_API_KEY).strip()
+
+def gemini_genai(prompt: str, timeout: float = GEMINI_TIMEOUT, cancel: threading.Event | None = None) -> str:
+    """google-genai 백엔드. timeout: 요청 제한(초), cancel: 설정되면 스트림을 닫고 중단. 실패 시 예외."""
+    import contextlib, io as _io
+    from google import genai
+    with contextlib.redirect_stderr(_io.StringIO()):
+        client = genai.Client(api_key=_gemini_key())
+        stream = client.models.generate_content_stream(
+            model=GEMINI_MODEL_PRIMARY,
+            contents=_GEMINI_SYSTEM + "\n\n" + prompt,
+            config={"temperature": 0.1, "top_p": 0.9, "max_output_tokens": 500,
+                    "http_options": {"timeout": int(timeout * 1000)}},
+        )
+        return sanitize_ai_stream(_stream_texts(stream, cancel))
+
+def gemini_generativeai(prompt: str, timeout: float = GEMINI_TIMEOUT, cancel: threading.Event | None = None) -> str:
+    """google-generativeai 백엔드. 인자는 gemini_genai 와 같음. 실패 시 예외."""
     import contextlib, io as _io
-    fake_err = _io.StringIO()
+    import google.generativeai as gen
+    with contextlib.redirect_stderr(_io.StringIO()):
+        gen.configure(api_key=_gemini_key())
+        model = gen.GenerativeModel(GEMINI_MODEL_FALLBACK, system_instruction=_GEMINI_SYSTEM)
+        stream = model.generate_content(
+            prompt,
+            generation_config={"temperature": 0.1, "top_p": 0.9, "max_output_tokens": 500},
+            safety_settings=None,
+            request_options={"timeout": timeout},
+            stream=True,
+        )
+        return sanitize_ai_stream(_stream_texts(stream, cancel))
 
-    # 1) google-genai
+# (이름, 호출 함수(prompt, timeout, cancel)) 우선순위 순. 앞쪽이 주 백엔드, 뒤쪽은 hedge/대체용
+AI_BACKENDS = [
+    ("genai", gemini_genai),
+    ("generativeai", gemini_generativeai),
+]
+
+# ===== AI 병렬 디스패치(hedge + 실행 예산) =====
+def _run_backend(name: str, fn, prompt: str, timeout: float, cancel: threading.Event, out: queue.Queue):
+    try:
+        out.put((name, fn(prompt, timeout, cancel), None))
+    except Exception as e:
+        out.put((name, None, e))
+
+def ask_ai_hedged(prompt: str, deadline: float, backends: list | None = None,
+                  use_cache: bool = True, fp: str | None = None) -> tuple[str | None, str]:
+    """
+    주 백엔드를 먼저 시작하고, AI_HEDGE_DELAY 안에 답이 없거나 실패하면 다음 백엔드를 겹쳐 시작.
+    먼저 성공한 답을 쓰고, 반환 시(승자 결정/예산 초과/전부 실패) cancel 로 나머지 스트림을 닫는다.
+    호출은 daemon 스레드 → 늦게 끝나는 백엔드가 있어도 프로세스 종료를 붙잡지 않는다.
+    각 호출의 요청 timeout 은 남은 예산(최대 GEMINI_TIMEOUT).
+    fp: 캐시 키(기본: 프롬프트 지문)
+    반환: (답변 | deadline 초과 시 None, 메모)
+    """
+    fp = fp or ai_fingerprint(prompt)
+    cached = ai_cache_get(fp) if use_cache else None
+    if cached is not None:
+        return cached, "캐시 적중"
+    backends = backends or AI_BACKENDS
+    out: queue.Queue = queue.Queue()
+    cancel = threading.Event()
+    running = 0
+    errors: List[str] = []
+    nxt = 0
+    t0 = hedge_at = time.time()
     try:
-        from google import genai
-        with contextlib.redirect_stderr(fake_err):
-            client = genai.Client(api_key=key)
-            resp = client.models.generate_content(
-                model=GEMINI_MODEL_PRIMARY,
-                contents=_GEMINI_SYSTEM + "\n\n" + prompt,
-                config={"temperature": 0.1, "top_p": 0.9, "max_output_tokens": 500},
-                safety_settings=None,
-                request_options={"timeout": GEMINI_TIMEOUT},
-            )
-        raw = (getattr(resp, "text", "") or "").strip()
-        return _sanitize_ai_text(raw)
-    except Exception as e1:
-        # 2) google-generativeai
+        while running or nxt < len(backends):
+            now = time.time()
+            if now >= deadline:
+                return None, "실행 예산 초과"
+            if nxt < len(backends) and (not running or now >= hedge_at):
+                name, fn = backends[nxt]
+                threading.Thread(target=_run_backend, name=f"ai-{name}", daemon=True,
+                                 args=(name, fn, prompt, min(GEMINI_TIMEOUT, deadline - now), cancel, out)).start()
+                running += 1
+                nxt += 1
+                hedge_at = now + AI_HEDGE_DELAY
+            timeout = deadline - now
+            if nxt < len(backends):
+                timeout = min(timeout, max(0.0, hedge_at - now))
+            try:
+                name, answer, err = out.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                continue
+            running -= 1
+            if err is not None:
+                errors.append(f"{name}:{err}")
+                hedge_at = time.time()   # 실패 즉시 다음 백엔드
+                continue
+            ai_cache_put(fp, answer)
+            return answer, f"{name} 응답 {time.time() - t0:.1f}s"
+        return f"(AI 질의 실패: {' | '.join(errors)})", "전 백엔드 실패"
+    finally:
+        cancel.set()
+
+# ===== 로컬 LLM(OpenAI 호환) 백엔드: 연결 풀 + 다중 파일 일괄 질의 =====
+_LLM_LOCK = threading.Lock()
+_LLM_SESSION: requests.Session | None = None
+
+_LLM_BATCH_GUIDE = (
+    "아래 여러 로그 파일을 파일별로 각각 분석하라. 항목 형식은 위 규칙과 같다.\n"
+    '출력은 JSON 하나만: {"files": [{"id": <파일 번호>, "answer": "<4줄 블록>"}]}\n'
+)
+
+def llm_settings() -> dict:
+    """config.yaml llm 섹션 (enabled/endpoint/model/api_key/timeout_sec/max_chars)."""
+    llm = load_config().get("llm") or {}
+    return {
+        "enabled": bool(llm.get("enabled")) and bool(llm.get("endpoint")),
+        "endpoint": llm.get("endpoint", ""),
+        "model": llm.get("model", ""),
+        "api_key": llm.get("api_key") or "",
+        "timeout_sec": float(llm.get("timeout_sec") or 8),
+        "max_chars": int(llm.get("max_chars") or 8000),
+    }
+
+def llm_session() -> requests.Session:
+    """keep-alive 연결을 재사용하는 프로세스 공용 세션."""
+    global _LLM_SESSION
+    with _LLM_LOCK:
+        if _LLM_SESSION is None:
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(2, AI_MAX_PARALLEL))
+            sess.mount("http://", adapter)
+            sess.mount("https://", adapter)
+            _LLM_SESSION = sess
+        return _LLM_SESSION
+
+def pack_llm_batch(prompts: List[str], max_chars: int) -> str:
+    """
+    여러 파일 프롬프트를 하나의 사용자 메시지로 포장. 전체 길이는 max_chars 를 넘지 않는다.
+    파일별 몫을 균등 배분하고, 넘치는 프롬프트는 뒷부분을 잘라낸다.
+    """
+    heads = [f"=== FILE {i} ===\n" for i in range(1, len(prompts) + 1)]
+    fixed = len(_LLM_BATCH_GUIDE) + sum(len(h) + 1 for h in heads)
+    share = max(0, (max_chars - fixed) // max(1, len(prompts)))
+    parts = [_LLM_BATCH_GUIDE]
+    for head, p in zip(heads, prompts):
+        body = p if len(p) <= share else p[:max(0, share - 1)] + "…"
+        parts.append(head + body + "\n")
+    return "".join(parts)[:max_chars]
+
+def _parse_llm_batch(content: str, n: int) -> dict[int, str]:
+    m = re.search(r"\{.*\}", content or "", flags=re.S)
+    data = json.loads(m.group(0)) if m else {}
+    out = {}
+    for item in data.get("files") or []:
+        try:
+            idx = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= idx <= n and item.get("answer"):
+            out[idx - 1] = _sanitize_ai_text(str(item["answer"]))
+    return out
+
+def ask_llm_batch(prompts: List[str], settings: dict | None = None,
+                  deadline: float | None = None) -> dict[int, str]:
+    """
+    로컬 LLM 에 파일 여러 개를 요청 1회로 질의. 반환: {프롬프트 index: 답변} (빠진 파일은 없음).
+    실패 시 예외.
+    """
+    st = settings or llm_settings()
+    headers = {"Content-Type": "application/json"}
+    if st["api_key"]:
+        headers["Authorization"] = f"Bearer {st['api_key']}"
+    body = {
+        "model": st["model"],
+        "messages": [
+            {"role": "system", "content": _GEMINI_SYSTEM},
+            {"role": "user", "content": pack_llm_batch(prompts, st["max_chars"])},
+        ],
+        "temperature": 0.1,
+        "response_format": {"type": "json_object"},
+    }
+    timeout = st["timeout_sec"] if deadline is None else max(0.5, min(st["timeout_sec"], deadline - time.time()))
+    resp = llm_session().post(st["endpoint"], json=body, headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    content = resp.json()["choices"][0]["message"]["content"]
+    return _parse_llm_batch(content, len(prompts))
+
+def dispatch_ai(rows: List[dict], deadline: float, max_parallel: int = AI_MAX_PARALLEL):
+    """
+    ai_prompt 가 있는 행들의 chatgpt_answer 를 채운다.
+    캐시 → (llm.enabled 면) 로컬 LLM 일괄 질의 1회 → 남은 행만 Gemini hedge 병렬 질의.
+    예산(deadline)을 넘긴 행은 ai_fallback(로컬 요약)을 그대로 둔다.
+    """
+    pending = []
+    for r in rows:
+        if not r.get("ai_prompt"):
+            continue
+        cached = ai_cache_get(ai_row_key(r))
+        if cached is not None:
+            r["chatgpt_answer"], r["ai_called"] = cached, "Y"
+            _note(f"  - AI [{r['log_path']}]: 캐시 적중")
+        else:
+            pending.append(r)
+    if not pending:
+        return
+
+    st = llm_settings()
+    if st["enabled"] and time.time() < deadline:
+        t0 = time.time()
         try:
-            import google.generativeai as gen
-            with contextlib.redirect_stderr(fake_err):
-                gen.configure(api_key=key)
-                model = gen.GenerativeModel(GEMINI_MODEL_FALLBACK, system_instruction=_GEMINI_SYSTEM)
-                resp = model.generate_content(
-                    prompt,
-                    generation_config={"temperature": 0.1, "top_p": 0.9, "max_output_tokens": 500},
-                    safety_settings=None,
-                    request_options={"timeout": GEMINI_TIMEOUT},
-                )
-            raw = (getattr(resp, "text", "") or "").strip()
-            return _sanitize_ai_text(raw)
-        except Exception as e2:
-            return f"(AI 질의 실패: genai:{e1} | generativeai:{e2})"
+            answers = ask_llm_batch([r["ai_prompt"] for r in pending], st, deadline)
+        except Exception as e:
+            answers = {}
+            _note(f"  - 로컬 LLM 실패 → Gemini 로 대체: {e}")
+        for idx, answer in answers.items():
+            r = pending[idx]
+            r["chatgpt_answer"], r["ai_called"] = answer, "Y"
+            ai_cache_put(ai_row_key(r), answer)
+            _note(f"  - AI [{r['log_path']}]: 로컬 LLM 일괄 응답 {time.time() - t0:.1f}s")
+        pending = [r for i, r in enumerate(pending) if i not in answers]
+    if not pending:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futs = [(r, pool.submit(ask_ai_hedged, r["ai_prompt"], deadline, None, False, ai_row_key(r))) for r in pending]
+        for r, f in futs:
+            answer, memo = f.result()
+            if answer is None:
+                r["chatgpt_answer"] = r.get("ai_fallback", "")
+                r["ai_called"] = "N"
+            else:
+                r["chatgpt_answer"] = answer
+                r["ai_called"] = "Y"
+            _note(f"  - AI [{r['log_path']}]: {memo}")
 
 # ===== 엑셀 유틸 =====
 def auto_fit_columns(ws):
@@ -271,127 +1674,829 @@ def safe_save_excel(wb, path: str, tries: int = 3, delay: float = 1.5):
         f"엑셀 저장 실패 → 임시 '{tmp}'에 저장됨. 엑셀 닫고 원본 교체하세요."
     ) from last_err
 
-# ======================= 메인 =======================
-def main():
-    print("[LOG] SSH 접속 시도...")
-    cli = connect_ssh()
+# ======================= 이벤트 저장소(SQLite) =======================
+# 분류된 이벤트(핵심/규칙 매칭)를 로컬 DB 에 누적 → 서버 재접속 없이 기간별 조회.
+# ts 는 서버 로컬 시각 문자열("YYYY-MM-DD HH:MM:SS")이라 정렬/시간 단위 묶음이 그대로 된다.
+# 같은 구간을 다시 읽어도(tail/bisect 모드) (host, file, ts, 본문 해시, 순번) UNIQUE 로 중복 저장되지 않는다.
+_EVENT_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id        INTEGER PRIMARY KEY,
+    host      TEXT NOT NULL,
+    file      TEXT NOT NULL,
+    ts        TEXT NOT NULL,
+    category  TEXT NOT NULL,
+    severity  TEXT NOT NULL,
+    template  TEXT NOT NULL,
+    preview   TEXT NOT NULL,
+    ehash     TEXT NOT NULL,
+    seq       INTEGER NOT NULL,
+    UNIQUE (host, file, ts, ehash, seq)
+);
+CREATE INDEX IF NOT EXISTS ix_events_ts_host_cat ON events (ts, host, category);
+CREATE INDEX IF NOT EXISTS ix_events_host_cat_ts ON events (host, category, ts);
+"""
+_EVENT_DB_PRUNED = False   # 프로세스당 1회만 보존 기간 정리
+
+def event_template(ev: dict) -> str:
+    """실행 간에 안정적인 템플릿 키: 이벤트 서명에서 타임스탬프 토큰 제거 + 숫자/IP/HEX 마스킹."""
+    return " ".join(_mask_token(t) for t in event_signature(ev).split() if not _TS_TOKEN_RE.match(t))[:500]
+
+def event_records(path: str, events: List[dict], engine: dict | None = None) -> List[tuple]:
+    """
+    이번 수집분 전체 이벤트 중 핵심/규칙 매칭 건 → DB 행 (file, ts, category, severity, template, preview, ehash, seq).
+    analyze_collected 에서 이미 분류한 이벤트(3분창)는 결과를 재사용하고 나머지만 분류.
+    """
+    eng = engine or get_rule_engine()
+    recs: List[tuple] = []
+    seen: dict = {}
+    for ev in events:
+        if ev["ts"] is None:
+            continue
+        if "core" not in ev:
+            ok = passes_noise_filter(ev["text"], eng)
+            ev["tags"] = tag_event(ev["text"], eng) if ok else []
+            ev["core"] = ok and (bool(ev["tags"]) or is_core_error(ev["text"]))
+        if not ev["core"]:
+            continue
+        tag = ev["tags"][0] if ev["tags"] else CORE_RULE_DEFAULTS
+        ts = ev["ts"].strftime("%Y-%m-%d %H:%M:%S")
+        ehash = hashlib.sha1(ev["text"].encode("utf-8", "replace")).hexdigest()[:16]
+        seq = seen[(ts, ehash)] = seen.get((ts, ehash), -1) + 1   # 같은 초에 같은 본문 반복 시 구분
+        recs.append((path, ts, tag["category"] or "CORE", tag["severity"] or "", event_template(ev),
+                     event_preview(ev)[:2000], ehash, seq))
+    return recs
+
+def open_event_db(path: str = EVENT_DB_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript(_EVENT_DB_SCHEMA)
+    return con
+
+def prune_events(con: sqlite3.Connection, days: int = EVENT_DB_RETENTION_DAYS) -> int:
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    with con:
+        return con.execute("DELETE FROM events WHERE ts < ?", (cutoff,)).rowcount
+
+def store_events(rows: List[dict], path: str = EVENT_DB_PATH) -> int:
+    """결과 행들의 db_events 를 묶음 insert (중복 무시) + 보존 기간 정리. 반환: 새로 저장된 건수."""
+    global _EVENT_DB_PRUNED
+    recs = [rec for r in rows for rec in r.get("db_events") or []]
     try:
-        server_epoch = get_server_epoch(cli)
-        server_now = datetime.fromtimestamp(server_epoch)
-        print(f"[LOG] 서버 현재 시각: {server_now:%Y-%m-%d %H:%M:%S}")
-
-        rows = []  # 엑셀 행 모음
-        for path in LOG_PATHS:
-            print(f"\n[LOG] 처리 중: {path}")
-            lines = tail_recent_lines(cli, path, n=2000)
-
-            if not lines:
-                print("  - 내용 없음/파일 없음")
-                rows.append({
-                    "log_path": path,
-                    "core_samples": "",
-                    "recent_tail": "",
-                    "chatgpt_answer": "파일이 없거나 읽을 수 없습니다.",
-                    "ai_called": "N",
-                })
-                # 구분용 공백행
-                rows.append({"separator": True})
-                continue
+        con = open_event_db(path)
+    except sqlite3.Error as e:
+        print(f"[WARN] 이벤트 DB 열기 실패: {e}")
+        return 0
+    try:
+        before = con.total_changes
+        with con:
+            for i in range(0, len(recs), EVENT_DB_BATCH):
+                con.executemany(
+                    "INSERT OR IGNORE INTO events (host, file, ts, category, severity, template, preview, ehash, seq)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", recs[i:i + EVENT_DB_BATCH])
+        added = con.total_changes - before
+        pruned = 0
+        if not _EVENT_DB_PRUNED:
+            pruned = prune_events(con)
+            _EVENT_DB_PRUNED = True
+        if recs or pruned:
+            print(f"[LOG] 이벤트 DB: 신규 {added}건 저장 (수집 {len(recs)}건), 보존기간 초과 {pruned}건 삭제")
+        return added
+    except sqlite3.Error as e:
+        print(f"[WARN] 이벤트 DB 저장 실패: {e}")
+        return 0
+    finally:
+        con.close()
+
+_QUERY_BUCKETS = {
+    "minute": "substr(ts, 1, 16)",
+    "hour": "substr(ts, 1, 13) || ':00'",
+    "day": "substr(ts, 1, 10)",
+    "host": "host",
+    "file": "file",
+    "category": "category || '/' || severity",
+    "template": "template",
+}
+
+def parse_since(text: str) -> str:
+    """"7d" / "24h" / "30m" / "2025-10-01 00:00" → 'YYYY-MM-DD HH:MM:SS' 하한."""
+    m = re.fullmatch(r"(\d+)\s*([dhm])", text.strip())
+    if m:
+        unit = {"d": "days", "h": "hours", "m": "minutes"}[m.group(2)]
+        return (datetime.now() - timedelta(**{unit: int(m.group(1))})).strftime("%Y-%m-%d %H:%M:%S")
+    return text.strip()
+
+def query_events(host: str | None = None, category: str | None = None, grep: str | None = None,
+                 since: str | None = None, until: str | None = None, by: str = "hour",
+                 limit: int = 200, path: str = EVENT_DB_PATH) -> List[tuple]:
+    """
+    이벤트 DB 집계 조회 → [(묶음 키, 건수)].
+    host: "10.0.0.1" 또는 "10.0.0.1:22" / category: 규칙 category (대소문자 무시)
+    grep: 템플릿/요약 부분 문자열 (예: "ORA-") / since, until: parse_since 형식
+    by: minute|hour|day|host|file|category|template
+    """
+    if by not in _QUERY_BUCKETS:
+        raise ValueError(f"by 는 {', '.join(_QUERY_BUCKETS)} 중 하나")
+    where, args = [], []
+    if since:
+        where.append("ts >= ?"); args.append(parse_since(since))
+    if until:
+        where.append("ts < ?"); args.append(parse_since(until))
+    if host:
+        where.append("(host = ? OR host LIKE ?)"); args += [host, f"{host}:%"]
+    if category:
+        where.append("category = ? COLLATE NOCASE"); args.append(category)
+    if grep:
+        where.append("(instr(template, ?) > 0 OR instr(preview, ?) > 0)"); args += [grep, grep]
+    key = _QUERY_BUCKETS[by]
+    order = "k" if by in ("minute", "hour", "day") else "n DESC"
+    sql = (f"SELECT {key} AS k, COUNT(*) AS n FROM events"
+           f"{' WHERE ' + ' AND '.join(where) if where else ''} GROUP BY k ORDER BY {order} LIMIT ?")
+    con = open_event_db(path)
+    try:
+        return con.execute(sql, args + [limit]).fetchall()
+    finally:
+        con.close()
+
+def main_query(args):
+    t0 = time.time()
+    rows = query_events(args.host, args.category, args.grep, args.since, args.until, args.by, args.limit)
+    cond = ", ".join(f"{k}={v}" for k, v in (("host", args.host), ("category", args.category), ("grep", args.grep),
+                                             ("since", args.since), ("until", args.until)) if v)
+    print(f"[LOG] 이벤트 조회 ({cond or '전체'}) by {args.by}: {len(rows)}행, {(time.time() - t0) * 1000:.1f}ms")
+    for k, n in rows:
+        print(f"  {n:>8}  {k}")
+    print(f"  {sum(n for _, n in rows):>8}  (합계)")
+
+# ======================= 분당 에러율 시계열(급증 감지) =======================
+# host|file|category 별 분당 건수를 (시리즈 x 분) float32 배열로 유지(NaN = 관측 안 된 분).
+# 현재 3분창의 분당 건수를 과거 중앙값/MAD 와 비교해 급증일 때만 AI 를 호출한다.
+_RATE_LOCK = threading.Lock()
+_RATE: dict = {"keys": None, "index": {}, "data": None, "end": 0}
+
+def _minute(dt: datetime) -> int:
+    return int(dt.timestamp() // 60)
+
+def _rate_state() -> dict:
+    if _RATE["keys"] is None:
+        keys, data, end = [], np.full((0, RATE_HISTORY_MINUTES), np.nan, dtype=np.float32), 0
+        try:
+            with np.load(RATE_SERIES_PATH, allow_pickle=False) as z:
+                if z["data"].shape[1] == RATE_HISTORY_MINUTES:
+                    keys, data, end = [str(k) for k in z["keys"]], z["data"].astype(np.float32), int(z["end"])
+        except (OSError, KeyError, ValueError):
+            pass
+        _RATE.update(keys=keys, index={k: i for i, k in enumerate(keys)}, data=data, end=end)
+    return _RATE
+
+def _rate_advance(st: dict, end: int):
+    """마지막 열이 end 분이 되도록 왼쪽으로 밀고 새 열은 NaN."""
+    shift = end - st["end"]
+    if shift <= 0:
+        return
+    data = st["data"]
+    if shift >= data.shape[1]:
+        data[:] = np.nan
+    else:
+        data[:, :-shift] = data[:, shift:]
+        data[:, -shift:] = np.nan
+    st["end"] = end
 
-            window_start = server_now - timedelta(seconds=WINDOW_SECONDS)
-            core_hits_3min: List[str] = []
-            recent_hits_10: List[str] = lines[-10:]
-
-            for line in reversed(lines):
-                dt = parse_line_ts(line, server_now)
-                if dt is None:
-                    continue
-                if dt < window_start:
-                    break
-                if is_core_error(line):
-                    core_hits_3min.append(line)
-            core_hits_3min.reverse()
-
-            chatgpt_answer = ""
+def _rate_rows(st: dict, keys: List[str]) -> List[int]:
+    new = [k for k in keys if k not in st["index"]]
+    if new:
+        pad = np.full((len(new), RATE_HISTORY_MINUTES), np.nan, dtype=np.float32)
+        st["data"] = np.vstack([st["data"], pad])
+        for k in new:
+            st["index"][k] = len(st["keys"])
+            st["keys"].append(k)
+    return [st["index"][k] for k in keys]
+
+def rate_observe(fkey: str, recs: List[tuple], obs_start: datetime, now: datetime,
+                 window_sec: int = WINDOW_SECONDS, weights: List[int] | None = None) -> List[dict]:
+    """
+    이번 수집분(obs_start ~ now 구간을 빠짐없이 본 것으로 간주)의 카테고리별 분당 건수를 반영하고
+    현재 창을 기준선과 비교. recs: event_records 결과 (file, ts, category, ...).
+    weights: recs 각 행의 건수(에이전트의 분 단위 집계처럼 1행 = N건일 때). 없으면 1행 1건.
+    반환: [{"category", "current", "median", "threshold", "history", "spike"}] (numpy 없으면 []).
+    """
+    if np is None:
+        return []
+    k = max(1, -(-window_sec // 60))
+    cats = sorted({r[2] for r in recs})
+    with _RATE_LOCK:
+        st = _rate_state()
+        end = _minute(now)
+        _rate_advance(st, max(end, st["end"]))
+        H = RATE_HISTORY_MINUTES
+        c1 = H - 1 - (st["end"] - end)
+        c0 = max(0, c1 - (end - _minute(obs_start)))
+        prefix = f"{fkey}|"
+        known = [key[len(prefix):] for key in st["keys"] if key.startswith(prefix)]
+        cats = sorted(set(cats) | set(known))
+        if not cats or c1 < 0:
+            return []
+        rows = _rate_rows(st, [prefix + c for c in cats])
+        # 이번 구간 건수 (카테고리 x 분)
+        counts = np.zeros((len(cats), c1 - c0 + 1), dtype=np.float32)
+        if recs:
+            ci = {c: i for i, c in enumerate(cats)}
+            mins = np.array([_minute(datetime.strptime(r[1], "%Y-%m-%d %H:%M:%S")) for r in recs])
+            cols = mins - end + (c1 - c0)
+            ok = (cols >= 0) & (cols <= c1 - c0)
+            w = np.ones(len(recs), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+            np.add.at(counts, (np.array([ci[r[2]] for r in recs])[ok], cols[ok]), w[ok])
+        # 이미 관측된 분(겹쳐 읽은 tail 구간, 증분 경계 분)은 이중 집계 대신 큰 값 유지
+        block = st["data"][rows, c0:c1 + 1]
+        st["data"][rows, c0:c1 + 1] = np.where(np.isnan(block), counts, np.fmax(block, counts))
+        # 현재 창 vs 과거(현재 창 제외) 기준선: 분당 건수의 중앙값/MAD, 시리즈 단위로 한 번에
+        data = st["data"][rows, :c1 + 1]
+        elapsed = (k - 1) + max(now.second, 1) / 60   # 마지막 열(현재 분)은 진행 중이므로 경과분만큼만
+        cur = np.nansum(data[:, -k:], axis=1) / elapsed
+        hist = data[:, :-k]
+        nobs = np.sum(~np.isnan(hist), axis=1)
+        enough = nobs >= RATE_MIN_HISTORY
+        with np.errstate(all="ignore"):
+            hist = np.where(enough[:, None], hist, 0)
+            med = np.nanmedian(hist, axis=1) if hist.shape[1] else np.zeros(len(rows))
+            mad = np.nanmedian(np.abs(hist - med[:, None]), axis=1) if hist.shape[1] else np.zeros(len(rows))
+        thr = med + RATE_SPIKE_Z * np.maximum(1.4826 * mad, RATE_MIN_SIGMA)
+        spike = ~enough | (cur > thr)
+    return [{"category": c, "current": float(cur[i]), "median": float(med[i]), "threshold": float(thr[i]),
+             "history": int(nobs[i]), "spike": bool(spike[i] and cur[i] > 0)}
+            for i, c in enumerate(cats)]
+
+def rate_save():
+    """관측 이력이 하나도 없는 시리즈는 버리고 저장."""
+    if np is None:
+        return
+    with _RATE_LOCK:
+        st = _RATE
+        if st["keys"] is None:
+            return
+        keep = ~np.all(np.isnan(st["data"]), axis=1)
+        keys = np.array([k for k, ok in zip(st["keys"], keep) if ok], dtype=str)
+        os.makedirs(os.path.dirname(RATE_SERIES_PATH), exist_ok=True)
+        tmp = RATE_SERIES_PATH + ".tmp.npz"
+        np.savez_compressed(tmp, keys=keys, data=st["data"][keep], end=np.int64(st["end"]))
+        os.replace(tmp, RATE_SERIES_PATH)
+
+# ======================= 메인 =======================
+def analyze_collected(path: str, collected: dict | None, server_now: datetime, fkey: str) -> dict:
+    """수집 결과 1건 → 엑셀 행 1건 (3분창 핵심 에러 판정 + AI/로컬 요약)."""
+    lines = collected["lines"] if collected else []
+    context = collected["context"] if collected else []
+    recent = collected.get("recent", []) if collected else []
+
+    if not lines and not context and not recent:
+        _note("  - 내용 없음/파일 없음")
+        return {
+            "log_path": path,
+            "core_samples": "",
+            "recent_tail": "",
+            "chatgpt_answer": "파일이 없거나 읽을 수 없습니다.",
+            "ai_called": "N",
+        }
+
+    window_start = server_now - timedelta(seconds=WINDOW_SECONDS)
+    core_events: List[dict] = []
+    recent_hits_10: List[str] = recent or (context + lines)[-10:]
+
+    pin_ts_format(fkey, lines, server_now)
+    events = assemble_events(lines, fkey, server_now)
+    engine = get_rule_engine()
+    tag_counts: dict = {}
+    aborted: tuple | None = None     # (이벤트, ABORT 규칙)
+    noise_dropped = 0
+    for ev in reversed(events):
+        if ev["ts"] is None:
+            continue
+        if ev["ts"] < window_start:
+            break
+        if not passes_noise_filter(ev["text"], engine):
+            noise_dropped += 1
+            ev["tags"], ev["core"] = [], False
+            continue
+        ev["tags"] = tag_event(ev["text"], engine)
+        ev["core"] = bool(ev["tags"]) or is_core_error(ev["text"])
+        if not ev["core"]:
+            continue
+        core_events.append(ev)
+        for t in ev["tags"]:
+            key = (t["category"], t["severity"], t["action"])
+            tag_counts[key] = tag_counts.get(key, 0) + 1
+        abort_rule = next((t for t in ev["tags"] if t["action"] == "ABORT"), None)
+        if abort_rule is not None:
+            aborted = (ev, abort_rule)
+            break   # ABORT 규칙: 이 파일의 나머지 분석 생략
+    core_events.reverse()
+    if len(events) < len(lines):
+        _note(f"  - 이벤트 조립: {len(lines)}줄 → {len(events)}건")
+    if noise_dropped:
+        _note(f"  - noise_filter 제외: {noise_dropped}건")
+    agent = collected.get("agent")
+    if agent:
+        # 에이전트: 수신한 원문은 최대 AGENT_MAX_SAMPLES 건 → 건수는 에이전트 집계(전체)를 사용
+        tag_counts = {}
+        for t in agent["templates"]:
+            for cat, sev, act in t["tags"]:
+                tag_counts[(cat, sev, act)] = tag_counts.get((cat, sev, act), 0) + t["count"]
+    rule_tags = "\n".join(f"{cat}/{sev}/{act} x{cnt}" for (cat, sev, act), cnt in tag_counts.items())
+    db_events = event_records(path, events, engine)
+    if collected.get("since"):
+        first_ts = datetime.fromtimestamp(collected["since"])   # 에이전트: 창 전체를 서버에서 봤음
+    else:
+        first_ts = next((ev["ts"] for ev in events if ev["ts"] is not None), None)
+    if not first_ts:
+        rates = []
+    elif agent:
+        per_min = [(path, ts, cat, n) for cat, m in agent["minutes"].items() for ts, n in m.items()]
+        rates = rate_observe(fkey, per_min, first_ts, server_now, WINDOW_SECONDS, [r[3] for r in per_min])
+    else:
+        rates = rate_observe(fkey, db_events, first_ts, server_now, WINDOW_SECONDS)
+    spikes = [r for r in rates if r["spike"]]
+
+    # 반복 에러는 템플릿 x 건수로 접어서 엑셀/프롬프트 크기 고정
+    if agent:
+        top = sorted(agent["templates"], key=lambda t: -t["count"])[:50]
+        core_hits_3min: List[str] = [t["sample"] if t["count"] == 1 else f"[x{t['count']}] {t['template']}" for t in top]
+        core_templates = [t["template"] for t in top]
+        core_codes = error_codes([t["sample"] for t in top])
+        if agent["core"] > len(agent["templates"]):
+            _note(f"  - 템플릿 묶음(에이전트): 핵심 {agent['core']}건 → {len(agent['templates'])}종")
+    else:
+        miner = new_template_miner()
+        for ev in core_events:
+            mine_template(miner, event_signature(ev), sample=event_preview(ev))
+        core_hits_3min = template_rows(miner, limit=50)
+        core_templates = [" ".join(cl["tokens"])
+                          for cl in sorted(miner["clusters"].values(), key=lambda c: -c["count"])[:50]]
+        core_codes = error_codes([ev["text"] for ev in core_events])
+        if core_events and len(miner["clusters"]) < len(core_events):
+            _note(f"  - 템플릿 묶음: 핵심 {len(core_events)}건 → {len(miner['clusters'])}종")
+
+    chatgpt_answer = ""
+    ai_called = "N"
+    ai_prompt = ""        # 채워지면 dispatch_ai 가 병렬 질의
+    ai_key = ""           # 캐시 키(비면 프롬프트 지문)
+    ai_fallback = ""
+    core_preview = ""
+    tail_preview = ""
+
+    for (cat, sev, act), cnt in tag_counts.items():
+        _note(f"  - 규칙 매칭: {cat}/{sev}/{act} x{cnt}")
+
+    if aborted is not None:
+        # ABORT 규칙(OOM, SSL 등): 원인이 규칙 note 로 확정 → AI 생략
+        ev, rule = aborted
+        core_preview = "\n".join(core_hits_3min[:20])
+        chatgpt_answer = (f"[상태] {rule['category']}/{rule['severity']} 중단 규칙 매칭 ({rule['pattern']})\n"
+                          f"[의심 원인] - {rule['note'] or '없음'}\n"
+                          f"[즉시 점검] - {event_preview(ev, 1)}\n"
+                          f"[다음 조치] - 후속 작업 중단, 원인 조치 후 재점검 (규칙 action: {rule['action']})")
+        _note(f"  - ABORT 규칙 매칭({rule['pattern']}) → 나머지 분석/AI 생략")
+    elif core_hits_3min and not spikes and any(r["current"] > 0 for r in rates):
+        # 핵심 에러지만 분당 건수가 평소 범위 → AI 생략
+        core_preview = "\n".join(core_hits_3min[:20])
+        rate_txt = ", ".join(f"{r['category']} {r['current']:.1f}/분(기준 {r['median']:.1f}, 임계 {r['threshold']:.1f})"
+                             for r in rates if r["current"] > 0)
+        chatgpt_answer = f"[평시 수준] 핵심 에러 {len(core_hits_3min)}종, 에러율 정상 범위: {rate_txt}"
+        _note(f"  - 핵심 에러 있으나 에러율 평시 수준 → AI 생략 ({rate_txt})")
+    elif core_hits_3min:
+        # 핵심 에러(에러율 급증 또는 기준선 부족) → AI 호출
+        for r in spikes:
+            why = "기준선 부족" if r["history"] < RATE_MIN_HISTORY else f"임계 {r['threshold']:.1f}/분 초과"
+            _note(f"  - 에러율 {r['category']}: {r['current']:.1f}/분 ({why})")
+        core_preview = "\n".join(core_hits_3min[:20])
+        ai_prompt = build_prompt_for_ai(path, core_hits_3min)
+        ai_key = ai_template_key(path, core_templates, [cat for cat, _, _ in tag_counts], core_codes)
+        ai_fallback = f"[로컬 요약] AI 응답 시간 초과. 핵심 에러 {len(core_hits_3min)}종: {core_hits_3min[0][:200]}"
+        _note("  - 핵심 에러 감지 → AI 호출")
+    else:
+        # 핵심 에러 없음
+        tail_preview = "\n".join(recent_hits_10)
+        if is_all_info(recent_hits_10):
+            # 모두 INFO: 로컬 1줄 요약
+            first_ts = re.search(r"\d{4}[-/]\d{2}[-/]\d{2}.*?\d{2}:\d{2}:\d{2}", recent_hits_10[0] if recent_hits_10 else "")
+            last_ts  = re.search(r"\d{4}[-/]\d{2}[-/]\d{2}.*?\d{2}:\d{2}:\d{2}", recent_hits_10[-1] if recent_hits_10 else "")
+            span = f" ({first_ts.group()} ~ {last_ts.group()})" if first_ts and last_ts else ""
+            chatgpt_answer = f"[정상] 최근 10줄은 모두 INFO{span}. 특이사항 없음."
             ai_called = "N"
-            core_preview = ""
-            tail_preview = ""
-
-            if core_hits_3min:
-                # 핵심 에러 → AI 호출
-                core_preview = "\n".join(core_hits_3min[:20])
-                chatgpt_answer = ask_ai(build_prompt_for_ai(path, core_hits_3min))
-                ai_called = "Y"
-                print("  - 핵심 에러 감지 → AI 호출")
-            else:
-                # 핵심 에러 없음
-                tail_preview = "\n".join(recent_hits_10)
-                if is_all_info(recent_hits_10):
-                    # 모두 INFO: 로컬 1줄 요약
-                    first_ts = re.search(r"\d{4}[-/]\d{2}[-/]\d{2}.*?\d{2}:\d{2}:\d{2}", recent_hits_10[0] if recent_hits_10 else "")
-                    last_ts  = re.search(r"\d{4}[-/]\d{2}[-/]\d{2}.*?\d{2}:\d{2}:\d{2}", recent_hits_10[-1] if recent_hits_10 else "")
-                    span = f" ({first_ts.group()} ~ {last_ts.group()})" if first_ts and last_ts else ""
-                    chatgpt_answer = f"[정상] 최근 10줄은 모두 INFO{span}. 특이사항 없음."
-                    ai_called = "N"
-                    print("  - 에러 없음 & 모두 INFO → 로컬 1줄 요약")
-                else:
-                    # 3분창 밖이라도 최근 10줄에 핵심 키워드면 AI 호출
-                    if TRIGGER_AI_ON_TAIL_CORE and tail_has_core_keywords(recent_hits_10):
-                        chatgpt_answer = ask_ai(build_prompt_from_tail(path, recent_hits_10))
-                        ai_called = "Y"
-                        print("  - 에러 없음(3분 밖) & 최근 10줄 핵심 키워드 → AI 호출")
-                    elif ALWAYS_ASK_AI or ASK_AI_IF_NO_ERROR:
-                        chatgpt_answer = ask_ai(build_prompt_from_tail(path, recent_hits_10))
-                        ai_called = "Y"
-                        print("  - 에러 없음 & 일부 WARN 등 → 최근 10줄 기반 AI 요약 호출")
-                    else:
-                        chatgpt_answer = "[주의] 최근 10줄에 INFO 외 메시지 포함. 세부 점검 권장."
-                        ai_called = "N"
-                        print("  - 에러 없음 & 일부 WARN 등 → 로컬 1줄 요약")
-
-            rows.append({
-                "log_path": path,
-                "core_samples": core_preview,
-                "recent_tail": tail_preview,
-                "chatgpt_answer": chatgpt_answer,
-                "ai_called": ai_called,
-            })
-            # 구분용 공백행
-            rows.append({"separator": True})
-
-        # ===== 엑셀 기록 =====
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        sheet_name = f"log_result_{ts}"[:31]
-
-        if os.path.exists(EXCEL_PATH):
-            wb = load_workbook(EXCEL_PATH)
+            _note("  - 에러 없음 & 모두 INFO → 로컬 1줄 요약")
         else:
-            wb = Workbook()
-        ws = wb.create_sheet(title=sheet_name)
+            # 3분창 밖이라도 최근 10줄에 핵심 키워드면 AI 호출
+            if TRIGGER_AI_ON_TAIL_CORE and tail_has_core_keywords(recent_hits_10):
+                ai_prompt = build_prompt_from_tail(path, recent_hits_10)
+                ai_fallback = "[로컬 요약] AI 응답 시간 초과. 최근 10줄에 핵심 키워드 포함, 세부 점검 권장."
+                _note("  - 에러 없음(3분 밖) & 최근 10줄 핵심 키워드 → AI 호출")
+            elif ALWAYS_ASK_AI or ASK_AI_IF_NO_ERROR:
+                ai_prompt = build_prompt_from_tail(path, recent_hits_10)
+                ai_fallback = "[로컬 요약] AI 응답 시간 초과. 최근 10줄에 INFO 외 메시지 포함."
+                _note("  - 에러 없음 & 일부 WARN 등 → 최근 10줄 기반 AI 요약 호출")
+            else:
+                chatgpt_answer = "[주의] 최근 10줄에 INFO 외 메시지 포함. 세부 점검 권장."
+                ai_called = "N"
+                _note("  - 에러 없음 & 일부 WARN 등 → 로컬 1줄 요약")
 
-        headers = ["log_path", "core_samples", "recent_tail", "chatgpt_answer", "ai_called"]
-        ws.append(headers)
+    return {
+        "log_path": path,
+        "core_samples": core_preview,
+        "recent_tail": tail_preview,
+        "chatgpt_answer": chatgpt_answer or ai_fallback,
+        "ai_called": ai_called,
+        "rule_tags": rule_tags,
+        "ai_prompt": ai_prompt,
+        "ai_key": ai_key,
+        "ai_fallback": ai_fallback,
+        "db_events": db_events,
+    }
 
-        for r in rows:
-            if r.get("separator"):
-                ws.append(["", "", "", "", ""])  # 빈 줄로 시각적 구분
-                continue
-            ws.append([r.get(h, "") for h in headers])
+def run_host(cli: paramiko.SSHClient, conf: dict, cursors: dict | None,
+             ai_deadline: float | None = None) -> List[dict]:
+    """
+    접속된 호스트 1대의 로그(LOG_PATHS + config.yaml logs 후보 해석) 수집 → 분석 → AI 병렬 질의.
+    ai_deadline: 실행 전체 AI 예산 마감 시각(없으면 지금부터 AI_RUN_BUDGET).
+    반환: 파일별 행(구분용 공백행 미포함).
+    """
+    hkey = host_key(conf)
+    t0 = time.time()
+    with ssh_session.timed(conf):
+        paths = resolve_log_paths(cli, hkey)
+        server_epoch, collected_all = collect_all(cli, paths, cursors, hkey=hkey)
+    check_resolved_paths(hkey, paths, collected_all)
+    server_now = datetime.fromtimestamp(server_epoch)
+    _note(f"[LOG] 서버 현재 시각: {server_now:%Y-%m-%d %H:%M:%S}")
+    _note(f"[LOG] 로그 {len(paths)}개 병렬 수집 완료 ({time.time() - t0:.2f}s)")
 
-        apply_wrap(ws)
-        auto_fit_columns(ws)
-        safe_save_excel(wb, EXCEL_PATH)
-        print(f"\n[OK] 엑셀 저장 완료: {EXCEL_PATH} (시트: {sheet_name})")
+    rows = []
+    for path, (collected, notes) in zip(paths, collected_all):
+        _note(f"\n[LOG] 처리 중: {path}")
+        for msg in notes:
+            _note(msg)
+        row = analyze_collected(path, collected, server_now, file_key(hkey, path))
+        row["db_events"] = [(hkey,) + rec for rec in row.get("db_events") or []]
+        rows.append(row)
 
+    if any(r.get("ai_prompt") for r in rows):
+        _note("\n[LOG] AI 병렬 질의")
+        dispatch_ai(rows, ai_deadline or time.time() + AI_RUN_BUDGET)
+    return rows
+
+def write_result_sheet(rows: List[dict], headers: List[str], prefix: str = "log_result",
+                       footer: List[list] | None = None) -> str:
+    """결과 행을 EXCEL_PATH 새 시트에 기록. 행 사이 빈 줄로 구분, footer 는 맨 아래. 반환: 시트명."""
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    sheet_name = f"{prefix}_{ts}"[:31]
+
+    if os.path.exists(EXCEL_PATH):
+        wb = load_workbook(EXCEL_PATH)
+    else:
+        wb = Workbook()
+    ws = wb.create_sheet(title=sheet_name)
+
+    ws.append(headers)
+    for r in rows:
+        ws.append([r.get(h, "") for h in headers])
+        ws.append([""] * len(headers))  # 빈 줄로 시각적 구분
+    for r in footer or []:
+        ws.append(r)
+
+    apply_wrap(ws)
+    auto_fit_columns(ws)
+    safe_save_excel(wb, EXCEL_PATH)
+    return sheet_name
+
+RESULT_HEADERS = ["log_path", "core_samples", "recent_tail", "chatgpt_answer", "ai_called", "rule_tags"]
+
+def ai_cache_footer() -> List[list]:
+    st = ai_cache_stats()
+    print(f"[LOG] AI 캐시: hit {st['hits']} / miss {st['misses']} (적중률 {st['hit_rate']}, 보관 {st['size']}건)")
+    return [["ai_cache", f"hit={st['hits']} miss={st['misses']} hit_rate={st['hit_rate']} size={st['size']}"]]
+
+def print_ssh_report():
+    print("[LOG] SSH 세션 사용 현황")
+    for line in ssh_session.session_report():
+        print(line)
+
+def main():
+    conf = ssh_session.default_conf()
+    print(f"[LOG] SSH 세션 확보: {ssh_session.session_key(conf)}")
+    cli = connect_ssh(conf)
+    cursors = load_cursor_store() if COLLECT_MODE == "incremental" else None
+    rows = run_host(cli, conf, cursors, ai_deadline=time.time() + AI_RUN_BUDGET)
+    if cursors is not None:
+        save_cursor_store(cursors)
+    store_events(rows)
+    rate_save()
+    save_log_path_cache()
+    print_ssh_report()
+
+    # ===== 엑셀 기록 =====
+    sheet_name = write_result_sheet(rows, RESULT_HEADERS, footer=ai_cache_footer())
+    print(f"\n[OK] 엑셀 저장 완료: {EXCEL_PATH} (시트: {sheet_name})")
+
+# ======================= 다중 호스트(fleet) =======================
+FLEET_MAX_CONCURRENCY = 4     # 동시에 점검할 호스트 수
+FLEET_HOST_TIMEOUT = 300      # 호스트 1대 점검 제한 시간(초, 접속~분석)
+
+def load_fleet_hosts() -> List[dict]:
+    """
+    config.yaml fleet.hosts 목록. 항목에 없는 키(port/username/password)는 ssh 섹션 값을 상속.
+    fleet 섹션이 없으면 기본 접속 정보(ssh_session.default_conf) 1대.
+    """
+    cfg = load_config()
+    base = ssh_session.default_conf()
+    hosts = []
+    for h in (cfg.get("fleet") or {}).get("hosts") or []:
+        if isinstance(h, str):
+            h = {"host": h}
+        conf = {**base, **h}
+        conf["hostname"] = h.get("hostname") or h.get("host") or base["hostname"]
+        conf["port"] = int(conf["port"])
+        hosts.append(conf)
+    return hosts or [base]
+
+def _fleet_task(conf: dict, cursors: dict | None, live: dict,
+                ai_deadline: float) -> tuple[List[dict], List[str], dict | None]:
+    """
+    호스트 1대 점검. 커서는 이 호스트 몫만 복사해서 쓰고 돌려준다
+    → 제한 시간을 넘겨 버려진 작업이 나중에 끝나도 공용 커서는 바뀌지 않는다.
+    """
+    _NOTE_BUF.lines = []
+    hkey = host_key(conf)
+    own = None if cursors is None else {hkey: dict(cursors.get(hkey) or {})}
+    try:
+        cli = connect_ssh(conf)
+        live[hkey]["cli"] = cli
+        return run_host(cli, conf, own, ai_deadline), _NOTE_BUF.lines, own
     finally:
+        _NOTE_BUF.lines = None
+
+def _fleet_fail_rows(reason: str) -> List[dict]:
+    return [{"log_path": "", "chatgpt_answer": f"점검 실패: {reason}", "ai_called": "N"}]
+
+def run_fleet(hosts: List[dict], cursors: dict | None,
+              max_concurrency: int = FLEET_MAX_CONCURRENCY,
+              host_timeout: float = FLEET_HOST_TIMEOUT) -> List[dict]:
+    """
+    호스트별 전용 SSH 연결로 run_host 를 동시에 실행(전역 동시성 상한 + 호스트별 제한 시간).
+    제한 시간을 넘긴 호스트는 그 시점에 실패로 확정(연결을 끊어 작업 중단, 늦게 끝난 결과는 버림).
+    반환: hosts 순서대로 모은 행(각 행에 host 키 포함).
+    """
+    live: dict[str, dict] = {}
+    results: dict[str, List[dict]] = {}
+    failed: dict[str, str] = {}
+    ai_deadline = time.time() + AI_RUN_BUDGET   # 실행 전체(모든 호스트) 공통 AI 예산
+
+    def _submit(pool, conf):
+        hkey = host_key(conf)
+        live[hkey] = {"start": None, "cli": None}
+        def _run():
+            live[hkey]["start"] = time.time()
+            return _fleet_task(conf, cursors, live, ai_deadline)
+        return pool.submit(_run)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    try:
+        futs = {_submit(pool, conf): conf for conf in hosts}
+        pending = set(futs)
+        while pending:
+            done = {f for f in pending if f.done()}
+            for f in done:
+                conf = futs[f]
+                hkey = host_key(conf)
+                print(f"\n[LOG] ===== 호스트 {hkey} =====")
+                try:
+                    rows, notes, own = f.result()
+                    for msg in notes:
+                        print(msg)
+                    if cursors is not None:
+                        cursors[hkey] = own[hkey]
+                except Exception as e:
+                    print(f"[ERR] {hkey} 점검 실패: {e}")
+                    failed[hkey] = f"{e}"
+                    rows = _fleet_fail_rows(f"{e}")
+                results[hkey] = [{"host": hkey, **r} for r in rows]
+            pending -= done
+            now = time.time()
+            for f in list(pending):
+                hkey = host_key(futs[f])
+                st = live[hkey]
+                if st["start"] and now - st["start"] > host_timeout:
+                    pending.discard(f)   # 이 시점에 실패로 확정 — 이후 결과는 보지 않는다
+                    print(f"\n[LOG] ===== 호스트 {hkey} =====")
+                    print(f"[ERR] {hkey} 점검 실패: 제한 시간 초과({host_timeout:g}s)")
+                    failed[hkey] = "제한 시간 초과"
+                    results[hkey] = [{"host": hkey, **r} for r in _fleet_fail_rows("제한 시간 초과")]
+                    if st["cli"] is not None:
+                        ssh_session.drop(futs[f])   # 블로킹 중인 채널 read 를 깨워 작업 종료
+            if pending:
+                time.sleep(0.2)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)   # 버려진 작업을 기다리지 않음
+
+    print(f"\n[LOG] fleet 결과: 성공 {len(hosts) - len(failed)}대, 실패 {len(failed)}대")
+    for hkey, reason in failed.items():
+        print(f"  - {hkey}: {reason}")
+    return [r for conf in hosts for r in results.get(host_key(conf), [])]
+
+def main_fleet():
+    hosts = load_fleet_hosts()
+    fcfg = load_config().get("fleet") or {}
+    conc = int(fcfg.get("max_concurrency") or FLEET_MAX_CONCURRENCY)
+    host_timeout = float(fcfg.get("host_timeout_sec") or FLEET_HOST_TIMEOUT)
+    print(f"[LOG] fleet 모드: 호스트 {len(hosts)}대 (동시 {conc}, 호스트당 {host_timeout:.0f}s)")
+    cursors = load_cursor_store() if COLLECT_MODE == "incremental" else None
+    rows = run_fleet(hosts, cursors, conc, host_timeout)
+    if cursors is not None:
+        save_cursor_store(cursors)
+    store_events(rows)
+    rate_save()
+    save_log_path_cache()
+    print_ssh_report()
+    sheet_name = write_result_sheet(rows, ["host"] + RESULT_HEADERS, prefix="fleet_result",
+                                    footer=ai_cache_footer())
+    print(f"\n[OK] 엑셀 저장 완료: {EXCEL_PATH} (시트: {sheet_name})")
+
+# ======================= 감시(watch) 데몬 =======================
+WATCH_SUMMARY_SEC = 300     # 집계 요약 출력 주기(초)
+WATCH_EVENT_IDLE = 1.5      # 이 시간 동안 연속 라인이 없으면 진행 중 이벤트 확정(초)
+WATCH_POLL_SEC = 0.2        # 채널 수신 대기 간격(초)
+WATCH_BACKOFF_MAX = 60      # 재접속 대기 상한(초)
+
+def new_event_stream(fkey: str) -> dict:
+    return {"fkey": fkey, "buf": b"", "cur": None, "last": 0.0, "learn": []}
+
+def feed_event_stream(st: dict, data: bytes, now: datetime) -> List[dict]:
+    """
+    tail -F 로 받은 바이트 조각 → 완결 이벤트 목록 (assemble_events 의 스트리밍 판).
+    새 타임스탬프 라인이 오면 직전 이벤트를 확정한다.
+    포맷이 고정될 때까지 앞쪽 TS_LEARN_LINES 줄로 파일별 포맷 학습(pin_ts_format)을 재시도한다.
+    """
+    done = []
+    st["buf"] += data
+    *complete, st["buf"] = st["buf"].split(b"\n")
+    lines = [raw.decode("utf-8", "replace").rstrip("\r") for raw in complete]
+    learn = st["learn"]
+    if lines and learn is not None:
+        learn.extend([ln for ln in lines if not _CONT_RE.match(ln)][:TS_LEARN_LINES - len(learn)])
+        if pin_ts_format(st["fkey"], learn, now) is not None or len(learn) >= TS_LEARN_LINES:
+            st["learn"] = None
+    for line in lines:
+        dt = None if _CONT_RE.match(line) else parse_line_ts_pinned(st["fkey"], line, now)
+        cur = st["cur"]
+        if dt is None and cur is not None:
+            if cur["lines"] < EVENT_MAX_LINES:
+                cur["buf"].append(line)
+            cur["lines"] += 1
+        else:
+            if cur is not None:
+                done.append(cur)
+            st["cur"] = {"ts": dt, "buf": [line], "lines": 1}
+        st["last"] = time.time()
+    for ev in done:
+        ev["text"] = "\n".join(ev.pop("buf"))
+    return done
+
+def flush_event_stream(st: dict, idle: float = WATCH_EVENT_IDLE) -> dict | None:
+    """마지막 라인 이후 idle 초가 지나면 진행 중 이벤트를 확정."""
+    cur = st["cur"]
+    if cur is None or time.time() - st["last"] < idle:
+        return None
+    st["cur"] = None
+    cur["text"] = "\n".join(cur.pop("buf"))
+    return cur
+
+def _watch_handle(hkey: str, path: str, ev: dict, agg: dict, lock: threading.Lock):
+    """이벤트 1건 분류 → 핵심이면 즉시 ALERT 출력 + 요약용 집계."""
+    engine = get_rule_engine()
+    core = False
+    tags: list = []
+    if passes_noise_filter(ev["text"], engine):
+        tags = tag_event(ev["text"], engine)
+        core = bool(tags) or is_core_error(ev["text"])
+    with lock:
+        a = agg.setdefault((hkey, path), {"events": 0, "core": 0, "miner": new_template_miner(), "evs": []})
+        a["events"] += 1
+        if core:
+            a["core"] += 1
+            mine_template(a["miner"], event_signature(ev), sample=event_preview(ev))
+            ev["tags"], ev["core"] = tags, True
+            a["evs"].append(ev)   # 요약 시점에 이벤트 DB 로 묶음 저장
+    if core:
+        tag_txt = ",".join(f"{t['category']}/{t['severity']}/{t['action']}" for t in tags) or "CORE"
+        print(f"[ALERT] {datetime.now():%H:%M:%S} {hkey} {path} [{tag_txt}] {event_preview(ev, 1)}")
+
+def _watch_host(conf: dict, paths: List[str] | None, stop: threading.Event, agg: dict, lock: threading.Lock):
+    """
+    호스트 1대: SSH 세션 유지 + 로그별 tail -F 채널. 채널/세션이 끊기면 지수 backoff 로 재접속.
+    tail -n 0 으로 시작하므로 재접속 사이 구간은 다시 읽지 않는다.
+    """
+    hkey = host_key(conf)
+    backoff = 1
+    while not stop.is_set():
+        chans = {}
         try:
-            cli.close()
-        except Exception:
-            pass
+            cli = connect_ssh(conf)   # 공유 세션: keepalive/재접속은 ssh_session 이 처리
+            tr = cli.get_transport()
+            skew = get_server_epoch(cli) - time.time()   # 연도 보정은 서버 시계 기준(배치 수집과 동일)
+            for path in paths or resolve_log_paths(cli, hkey):   # None: 접속마다 후보 경로 재해석
+                ch = tr.open_session()
+                ch.exec_command(f"tail -n 0 -F {shell_quote(path)} 2>/dev/null")
+                chans[path] = (ch, new_event_stream(file_key(hkey, path)))
+            print(f"[LOG] {hkey} 감시 시작: 로그 {len(chans)}개")
+            backoff = 1
+            while not stop.is_set():
+                got = False
+                now = datetime.fromtimestamp(time.time() + skew)
+                for path, (ch, st) in chans.items():
+                    while ch.recv_ready():
+                        got = True
+                        for ev in feed_event_stream(st, ch.recv(65536), now):
+                            _watch_handle(hkey, path, ev, agg, lock)
+                    ev = flush_event_stream(st)
+                    if ev is not None:
+                        _watch_handle(hkey, path, ev, agg, lock)
+                    if ch.exit_status_ready() and not ch.recv_ready():
+                        raise EOFError(f"채널 종료: {path}")
+                if not tr.is_active():
+                    raise EOFError("세션 종료")
+                if not got:
+                    stop.wait(WATCH_POLL_SEC)
+        except Exception as e:
+            if stop.is_set():
+                break
+            print(f"[WARN] {hkey} 감시 끊김: {e} → {backoff}s 후 재접속")
+            stop.wait(backoff)
+            backoff = min(backoff * 2, WATCH_BACKOFF_MAX)
+        finally:
+            for ch, _ in chans.values():
+                try:
+                    ch.close()
+                except Exception:
+                    pass
+
+def print_watch_summary(agg: dict, lock: threading.Lock, period: float):
+    """주기 요약: 파일별 이벤트/핵심 건수 + 템플릿 상위. 출력 후 집계 초기화."""
+    with lock:
+        snap = dict(agg)
+        agg.clear()
+    store_events([{"db_events": [(hkey,) + rec for rec in event_records(path, a["evs"])]}
+                  for (hkey, path), a in snap.items()])
+    print(f"\n[LOG] ===== 감시 요약 ({datetime.now():%Y-%m-%d %H:%M:%S}, 최근 {period:.0f}s) =====")
+    if not snap:
+        print("  - 새 이벤트 없음")
+    for (hkey, path), a in sorted(snap.items()):
+        print(f"  - {hkey} {path}: 이벤트 {a['events']}건, 핵심 {a['core']}건")
+        for row in template_rows(a["miner"], limit=5):
+            print(f"      {row.splitlines()[0][:200]}")
+
+def main_watch(hosts: List[dict]):
+    """Ctrl+C 까지 상주. 호스트별 감시 스레드 + 주기 요약."""
+    stop = threading.Event()
+    lock = threading.Lock()
+    agg: dict = {}
+    threads = [threading.Thread(target=_watch_host, args=(conf, None, stop, agg, lock),
+                                name=f"watch-{host_key(conf)}", daemon=True) for conf in hosts]
+    print(f"[LOG] watch 모드: 호스트 {len(hosts)}대, 요약 주기 {WATCH_SUMMARY_SEC}s (종료: Ctrl+C)")
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            time.sleep(WATCH_SUMMARY_SEC)
+            print_watch_summary(agg, lock, WATCH_SUMMARY_SEC)
+    except KeyboardInterrupt:
+        print("\n[LOG] 감시 종료 요청")
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=5)
+        print_watch_summary(agg, lock, WATCH_SUMMARY_SEC)
 
 if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="서버 로그 수집/분석 → 엑셀 기록")
+    ap.add_argument("--fleet", action="store_true", help="config.yaml fleet.hosts 전체를 동시에 점검")
+    ap.add_argument("--watch", action="store_true", help="상주하며 tail -F 로 실시간 감시 (--fleet 와 함께 쓰면 전체 호스트)")
+    ap.add_argument("--query", action="store_true", help="서버 접속 없이 로컬 이벤트 DB 집계 조회")
+    ap.add_argument("--host", help="조회: 호스트 (예: 10.77.166.34)")
+    ap.add_argument("--category", help="조회: 규칙 category (예: DB, CORE)")
+    ap.add_argument("--grep", help="조회: 템플릿/본문 부분 문자열 (예: ORA-)")
+    ap.add_argument("--since", default="7d", help="조회: 시작 (7d / 24h / 30m / 'YYYY-MM-DD HH:MM')")
+    ap.add_argument("--until", help="조회: 끝 (since 와 같은 형식)")
+    ap.add_argument("--by", default="hour", choices=list(_QUERY_BUCKETS), help="조회: 묶음 기준")
+    ap.add_argument("--limit", type=int, default=200, help="조회: 최대 행 수")
+    args, _ = ap.parse_known_args()   # runpy 로 호출될 때 상위 스크립트 인자는 무시
     try:
-        main()
+        if args.query:
+            main_query(args)
+        elif args.watch:
+            main_watch(load_fleet_hosts() if args.fleet else [ssh_session.default_conf()])
+        elif args.fleet:
+            main_fleet()
+        else:
+            main()
     except (paramiko.ssh_exception.SSHException, socket.error) as e:
         print(f"[ERR] SSH 연결 실패: {e}")
     except Exception as e:
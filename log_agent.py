@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+log_agent.py
+
+err_log.py 가 서버에 1회 업로드(체크섬 이름으로 캐시)해 실행하는 원격 분류 에이전트.
+- 표준 라이브러리만 사용, python2.7 / python3 모두 동작
+- stdin 으로 받은 JSON 설정(경로 목록, 타임스탬프/핵심 패턴, 규칙, noise_filter)대로
+  파일별로 최근 N분 시작 위치를 이분 탐색 → 이벤트(스택트레이스) 조립 → 분류 → 템플릿 집계
+- 결과는 stdout 에 JSON 1개 (원문은 핵심 이벤트 샘플과 최근 몇 줄만)
+"""
+from __future__ import print_function
+
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+BLOCK = 8192
+PROBE_MAX = 64 * 1024
+
+
+# ===== 타임스탬프 =====
+def build_ts_parsers(specs):
+    return [(re.compile(pat), fmts) for pat, fmts in specs]
+
+
+def parse_ts(line, parsers, year, pinned):
+    """pinned: 파일별로 마지막에 맞은 파서 번호를 앞에 두어 재시도 최소화."""
+    order = list(range(len(parsers)))
+    if pinned[0] is not None:
+        order.remove(pinned[0])
+        order.insert(0, pinned[0])
+    for i in order:
+        creg, fmts = parsers[i]
+        m = creg.search(line)
+        if not m:
+            continue
+        ts = m.group("ts")
+        for fmt in fmts:
+            try:
+                dt = datetime.strptime(ts, fmt)
+            except ValueError:
+                continue
+            if "%Y" not in fmt:
+                dt = dt.replace(year=year)
+            pinned[0] = i
+            return dt
+    return None
+
+
+# ===== 이분 탐색 =====
+def first_ts_at(f, offset, parsers, year, pinned):
+    size = BLOCK
+    while True:
+        f.seek(offset)
+        data = f.read(size)
+        if not data:
+            return None
+        body = data
+        if offset > 0:
+            nl = data.find(b"\n")
+            body = data[nl + 1:] if nl >= 0 else b""
+        parts = body.split(b"\n")
+        if len(data) == size:
+            parts = parts[:-1]
+        for raw in parts:
+            dt = parse_ts(raw.decode("utf-8", "replace"), parsers, year, pinned)
+            if dt is not None:
+                return dt
+        if len(data) < size or size >= PROBE_MAX:
+            return None
+        size *= 2
+
+
+def locate_window(f, file_size, window_start, parsers, year, pinned):
+    lo, hi, probes = 0, file_size, 0
+    while hi - lo > BLOCK:
+        mid = (lo + hi) // 2
+        dt = first_ts_at(f, mid, parsers, year, pinned)
+        probes += 1
+        if dt is not None and dt < window_start:
+            lo = mid
+        else:
+            hi = mid
+    return lo, probes
+
+
+# ===== 분류 =====
+def build_classifier(cfg):
+    def _union(pats):
+        return re.compile("|".join("(?:%s)" % p for p in pats) or r"(?!x)x", re.I)
+    rules = []
+    for r in cfg.get("rules") or []:
+        try:
+            rules.append((re.compile(r["pattern"], re.I), r))
+        except (re.error, KeyError, TypeError):
+            continue
+    return {
+        "core_gate": _union(cfg.get("core_patterns") or []),
+        "rules": rules,
+        "keywords": cfg.get("keywords") or [],
+        "noise_enabled": bool(cfg.get("noise_enabled")),
+        "noise_words": cfg.get("noise_words") or [],
+        "require_hits": int(cfg.get("require_hits") or 1),
+    }
+
+
+def passes_noise(text, c):
+    if not c["noise_enabled"]:
+        return True
+    hits = 0
+    for w in c["noise_words"]:
+        if w in text:
+            hits += 1
+            if hits >= c["require_hits"]:
+                return True
+    return False
+
+
+def classify(text, c):
+    """반환: None(핵심 아님 / noise) 또는 [category, severity, action] 목록(빈 목록 = 규칙 없는 핵심)."""
+    if not passes_noise(text, c):
+        return None
+    tags = []
+    if not c["keywords"] or any(k in text for k in c["keywords"]):
+        tags = [[r.get("category", ""), r.get("severity", ""), r.get("action", "")]
+                for creg, r in c["rules"] if creg.search(text)]
+    if tags or c["core_gate"].search(text):
+        return tags
+    return None
+
+
+# ===== 템플릿 =====
+def build_masker(cfg):
+    ts_tok = re.compile(cfg.get("ts_token") or r"(?!x)x")
+    masks = [(re.compile(p), rep) for p, rep in cfg.get("token_masks") or []]
+
+    def _template(sig):
+        out = []
+        for tok in sig.split():
+            if ts_tok.match(tok):
+                continue
+            for creg, rep in masks:
+                tok = creg.sub(rep, tok)
+            out.append(tok)
+        return " ".join(out)[:500]
+    return _template
+
+
+def signature(lines, cont_re):
+    sig = [lines[0]]
+    for ln in lines[1:8]:
+        if not cont_re.match(ln) or ln.lstrip().startswith("Caused by:"):
+            sig.append(ln.strip())
+            break
+    return " ".join(sig)
+
+
+# ===== 파일 1개 =====
+def scan_file(path, cfg, parsers, cont_re, classifier, template, now):
+    res = {"path": path, "exists": False}
+    try:
+        st = os.stat(path)
+        f = io.open(path, "rb")
+    except (IOError, OSError):
+        return res
+    file_size = st.st_size
+    res.update(exists=True, size=file_size, ino=str(st.st_ino))
+    window_start = datetime.fromtimestamp(now - cfg["window"])
+    core_start = datetime.fromtimestamp(now - cfg.get("core_window", cfg["window"]))
+    year = datetime.fromtimestamp(now).year
+    pinned = [None]
+    with f:
+        start, probes = locate_window(f, file_size, window_start, parsers, year, pinned)
+        start = max(0, min(start, file_size - BLOCK))   # 창이 비어도 최근 줄은 보이도록 마지막 블록 포함
+        f.seek(start)
+        data = f.read(file_size - start)
+    if start > 0:
+        data = data[data.find(b"\n") + 1:]
+    lines = data.decode("utf-8", "replace").splitlines()[-cfg["max_lines"]:]
+    res.update(offset=start, probes=probes, bytes=len(data), lines=len(lines),
+               recent=lines[-cfg["recent_lines"]:], since=int(time.mktime(window_start.timetuple())))
+
+    # 이벤트 조립 (타임스탬프 라인이 새 이벤트, 연속 라인은 직전 이벤트에)
+    events = []
+    cur = None
+    for line in lines:
+        dt = None if cont_re.match(line) else parse_ts(line, parsers, year, pinned)
+        if dt is None and cur is not None:
+            if len(cur[1]) < cfg["event_max_lines"]:
+                cur[1].append(line)
+            cur[2] += 1
+            continue
+        cur = [dt, [line], 1]
+        events.append(cur)
+
+    # 분당 건수(카테고리별)는 창 전체, 템플릿/핵심 건수는 core_window 안만 — 샘플 수 제한과 무관한 정확한 값
+    templates = {}
+    samples = []
+    minutes = {}
+    counts = {"events": len(events), "core": 0, "in_window": 0}
+    for dt, buf, _n in events:
+        if dt is None or dt < window_start:
+            continue
+        counts["in_window"] += 1
+        text = "\n".join(buf)
+        tags = classify(text, classifier)
+        if tags is None:
+            continue
+        cat = (tags[0][0] if tags else "") or "CORE"
+        per_min = minutes.setdefault(cat, {})
+        mkey = dt.strftime("%Y-%m-%d %H:%M:00")
+        per_min[mkey] = per_min.get(mkey, 0) + 1
+        if dt < core_start:
+            samples.append(text)
+            continue
+        counts["core"] += 1
+        key = template(signature(buf, cont_re))
+        t = templates.get(key)
+        if t is None:
+            t = templates[key] = {"template": key, "count": 0, "tags": tags, "sample": "\n".join(buf[:6])}
+        t["count"] += 1
+        samples.append(text)
+    res["counts"] = counts
+    res["minutes"] = minutes
+    res["templates"] = sorted(templates.values(), key=lambda t: -t["count"])[:cfg["max_templates"]]
+    res["samples"] = samples[-cfg["max_samples"]:]
+    return res
+
+
+def main():
+    cfg = json.loads(sys.stdin.read())
+    now = time.time()
+    parsers = build_ts_parsers(cfg["ts_parsers"])
+    cont_re = re.compile(cfg["cont_re"])
+    classifier = build_classifier(cfg)
+    template = build_masker(cfg)
+    files = []
+    for path in cfg["paths"]:
+        t0 = time.time()
+        try:
+            res = scan_file(path, cfg, parsers, cont_re, classifier, template, now)
+        except Exception as e:   # 파일 1개 실패가 전체 결과를 막지 않도록
+            res = {"path": path, "exists": True, "error": "%s: %s" % (type(e).__name__, e)}
+        res["elapsed_ms"] = int((time.time() - t0) * 1000)
+        files.append(res)
+    out = json.dumps({"now": int(now), "files": files}, ensure_ascii=False, separators=(",", ":"))
+    if sys.version_info[0] < 3:
+        out = out.encode("utf-8")
+    sys.stdout.write(out)
+
+
+if __name__ == "__main__":
+    main()
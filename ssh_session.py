@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""
+ssh_session.py
+
+프로세스 전역 SSH 세션 관리자.
+common_util_patch → dbscanner → ... → report → err_log 체인은 runpy 로 한 프로세스에서 돌기 때문에
+이 모듈(sys.modules 에 1개)이 호스트/계정별 Transport 1개를 모든 단계에 나눠 준다.
+- 접속 정보: config.yaml ssh → config.SSH_CONFIG → 호출자가 준 기본값 순 (default_conf)
+- keepalive 유지, 끊긴 Transport 는 다음 요청 때 자동 재접속
+- 접속 시간(TCP / 키교환+인증)과 명령 시간을 따로 집계 → session_report()
+"""
+import atexit
+import hashlib
+import os
+import pathlib
+import re
+import secrets
+import shlex
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+import paramiko
+import yaml
+
+CONFIG_YAML = str((pathlib.Path(__file__).parent / "config.yaml").resolve())
+KEEPALIVE_SEC = 30      # Transport keepalive 주기(초). 방화벽/NAT 유휴 끊김 방지
+CONNECT_TIMEOUT = 15    # TCP/배너/인증 각각의 제한 시간(초)
+STREAM_POLL_SEC = 0.05  # 출력이 없을 때 채널 확인 간격(초)
+STREAM_KEEP_LINES = 200             # 스트림별로 결과에 남길 마지막 라인 수(나머지는 건수만)
+STREAM_MAX_LINE = 64 * 1024         # 개행 없이 이 크기를 넘으면 잘라서 한 줄로 처리
+PROBE_POLL_MIN = 0.2     # 준비 확인(probe) 첫 재시도 간격(초) — 빠른 서버에서는 곧바로 통과
+PROBE_POLL_MAX = 3.0     # 재시도 간격 상한(초)
+PROBE_BACKOFF = 1.5      # 재시도마다 간격 배수
+UPLOAD_WINDOW = 16 * 1024 * 1024    # 업로드용 SFTP 채널 윈도우(기본 2MB → 왕복 지연이 큰 구간에서 병목)
+UPLOAD_CHUNK = 1024 * 1024          # 로컬에서 읽어 pipelined write 로 넘기는 단위
+
+_LOCK = threading.Lock()
+_SESSIONS: dict = {}    # session_key → {"cli", "lock", "stats"}
+
+
+# ======================= 접속 정보 =======================
+def normalize_conf(conf: dict) -> dict:
+    """host/hostname 어느 쪽이든 받아 {"hostname", "host", "port"(int), "username", "password"} 로 정리."""
+    host = conf.get("hostname") or conf.get("host")
+    return {**conf, "hostname": host, "host": host, "port": int(conf.get("port") or 22),
+            "username": conf["username"], "password": conf.get("password")}
+
+def default_conf(fallback: dict | None = None) -> dict:
+    """config.yaml ssh 섹션 → config.py SSH_CONFIG → fallback 중 처음으로 완전한 것."""
+    try:
+        with open(CONFIG_YAML, "r", encoding="utf-8") as f:
+            ssh = (yaml.safe_load(f) or {}).get("ssh") or {}
+        if (ssh.get("host") or ssh.get("hostname")) and ssh.get("username"):
+            return normalize_conf(ssh)
+    except (OSError, yaml.YAMLError):
+        pass
+    try:
+        import config
+        return normalize_conf(config.SSH_CONFIG)
+    except (ImportError, AttributeError, KeyError):
+        pass
+    if fallback is None:
+        raise RuntimeError("SSH 접속 정보가 없습니다 (config.yaml ssh / config.py SSH_CONFIG)")
+    return normalize_conf(fallback)
+
+def session_key(conf: dict) -> str:
+    c = normalize_conf(conf)
+    return f"{c['username']}@{c['hostname']}:{c['port']}"
+
+
+# ======================= 세션 =======================
+def _new_stats() -> dict:
+    return {"connects": 0, "reconnects": 0, "tcp_sec": 0.0, "auth_sec": 0.0, "commands": 0, "command_sec": 0.0}
+
+def _entry(conf: dict) -> dict:
+    key = session_key(conf)
+    with _LOCK:
+        return _SESSIONS.setdefault(key, {"key": key, "cli": None, "lock": threading.Lock(), "stats": _new_stats()})
+
+def _alive(cli: paramiko.SSHClient | None) -> bool:
+    tr = cli.get_transport() if cli is not None else None
+    return tr is not None and tr.is_active()
+
+def _connect(conf: dict, timeout: float, ent: dict) -> paramiko.SSHClient:
+    c = normalize_conf(conf)
+    t0 = time.time()
+    sock = socket.create_connection((c["hostname"], c["port"]), timeout=timeout)
+    t1 = time.time()
+    cli = paramiko.SSHClient()
+    cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        cli.connect(
+            hostname=c["hostname"], port=c["port"], username=c["username"], password=c["password"],
+            sock=sock, timeout=timeout, banner_timeout=timeout, auth_timeout=timeout,
+            allow_agent=False, look_for_keys=False,
+        )
+    except Exception:
+        sock.close()
+        raise
+    t2 = time.time()
+    cli.get_transport().set_keepalive(KEEPALIVE_SEC)
+    st = ent["stats"]
+    st["connects"] += 1
+    st["tcp_sec"] += t1 - t0
+    st["auth_sec"] += t2 - t1
+    print(f"[LOG] SSH 세션 연결: {ent['key']} (TCP {(t1 - t0) * 1000:.0f}ms, 키교환+인증 {(t2 - t1) * 1000:.0f}ms)")
+    return cli
+
+def get_client(conf: dict | None = None, timeout: float = CONNECT_TIMEOUT) -> paramiko.SSHClient:
+    """
+    호스트/계정별 공유 SSHClient. 살아 있으면 그대로, 끊겼으면 재접속해서 반환.
+    공유 객체이므로 호출자는 close() 하지 않는다(프로세스 종료 시 close_all).
+    """
+    conf = conf or default_conf()
+    ent = _entry(conf)
+    with ent["lock"]:
+        if _alive(ent["cli"]):
+            return ent["cli"]
+        if ent["cli"] is not None:
+            ent["stats"]["reconnects"] += 1
+            print(f"[WARN] SSH 세션 끊김 감지: {ent['key']} → 재접속")
+            try:
+                ent["cli"].close()
+            except Exception:
+                pass
+        ent["cli"] = None
+        ent["cli"] = _connect(conf, timeout, ent)
+        return ent["cli"]
+
+def drop(conf: dict):
+    """세션을 닫고 버린다(다음 get_client 에서 새로 접속). 블로킹 중인 채널 read 도 깨운다."""
+    ent = _entry(conf)
+    cli, ent["cli"] = ent["cli"], None
+    if cli is not None:
+        try:
+            cli.close()
+        except Exception:
+            pass
+
+def close_all():
+    with _LOCK:
+        ents = list(_SESSIONS.values())
+    for ent in ents:
+        cli, ent["cli"] = ent["cli"], None
+        if cli is not None:
+            try:
+                cli.close()
+            except Exception:
+                pass
+
+atexit.register(close_all)
+
+
+# ======================= 명령 =======================
+@contextmanager
+def timed(conf: dict, commands: int = 1):
+    """블록 수행 시간을 해당 세션의 명령 시간으로 집계."""
+    ent = _entry(conf)
+    t0 = time.time()
+    try:
+        yield
+    finally:
+        with _LOCK:
+            ent["stats"]["commands"] += commands
+            ent["stats"]["command_sec"] += time.time() - t0
+
+def exec_command(conf: dict, cmd: str, timeout: float | None = None):
+    """
+    공유 세션에서 exec_command. 채널 열기 자체가 실패하면(세션이 방금 끊김) 재접속 후 1회 재시도.
+    채널이 열리기 전 실패이므로 명령이 두 번 실행되지는 않는다.
+    """
+    for attempt in range(2):
+        cli = get_client(conf)
+        try:
+            return cli.exec_command(cmd, timeout=timeout)
+        except (paramiko.SSHException, EOFError, OSError) as e:
+            if attempt:
+                raise
+            print(f"[WARN] 채널 열기 실패({e}) → 재접속 후 재시도")
+            drop(conf)
+
+def _line_sink(name: str, callback: Callable[[str], None] | None, keep: int) -> dict:
+    return {"name": name, "buf": b"", "tail": deque(maxlen=keep), "lines": 0, "bytes": 0, "cb": callback}
+
+def _sink_feed(sink: dict, data: bytes, final: bool = False):
+    """받은 조각을 줄 단위로 잘라 콜백 + 마지막 keep 줄만 보관. 메모리는 keep 줄 + 미완성 1줄로 고정."""
+    sink["bytes"] += len(data)
+    buf = sink["buf"] + data
+    *lines, buf = buf.split(b"\n")
+    if len(buf) > STREAM_MAX_LINE or (final and buf):
+        lines.append(buf)
+        buf = b""
+    sink["buf"] = buf
+    for raw in lines:
+        line = raw.decode("utf-8", errors="ignore").rstrip("\r")
+        sink["lines"] += 1
+        sink["tail"].append(line)
+        if sink["cb"] is not None:
+            sink["cb"](line)
+
+def stream(conf: dict, cmd: str,
+           on_stdout: Callable[[str], None] | None = None,
+           on_stderr: Callable[[str], None] | None = None,
+           timeout: float | None = None, idle_timeout: float | None = None,
+           keep_lines: int = STREAM_KEEP_LINES, stdin_data: bytes | Iterable[bytes] | None = None) -> dict:
+    """
+    명령 실행 중 stdout/stderr 를 한 루프에서 번갈아 비워(한쪽 윈도우가 차서 멈추는 일 없음)
+    줄이 완성될 때마다 콜백으로 전달.
+    stdin_data: bytes 또는 bytes 조각 iterable(다운로드 스트림 등). 출력 비우기와 번갈아 보내고 다 보내면 EOF
+    → 보내는 쪽과 원격 처리가 겹쳐 진행. 원격이 먼저 끝나 채널이 닫히면 남은 입력은 버린다.
+    timeout: 전체 제한(초) / idle_timeout: 두 스트림 모두 출력이 없는 시간 제한(초)
+    제한 초과 시 채널을 닫고 rc=None, timed_out="wall"|"idle".
+    반환: {"rc", "stdout", "stderr"(마지막 keep_lines 줄), "stdout_lines", "stderr_lines",
+           "bytes", "elapsed", "timed_out"}
+    """
+    out = _line_sink("stdout", on_stdout, keep_lines)
+    err = _line_sink("stderr", on_stderr, keep_lines)
+    timed_out = None
+    rc = None
+    with timed(conf):
+        stdin, stdout, _ = exec_command(conf, cmd)   # stdin 파일 객체가 수거되면 EOF 가 가므로 참조 유지
+        ch = stdout.channel
+        feed = None if stdin_data is None else iter([stdin_data] if isinstance(stdin_data, bytes) else stdin_data)
+        pending = b""
+        t0 = last = time.time()
+        try:
+            while True:
+                got = False
+                if feed is not None and ch.send_ready():
+                    if not pending:
+                        pending = next(feed, None)
+                        if pending is None:
+                            feed, pending = None, b""
+                            ch.shutdown_write()
+                    if pending:
+                        try:
+                            n = ch.send(pending[:65536])
+                        except OSError:   # 원격이 입력을 다 읽기 전에 종료
+                            feed, pending, n = None, b"", 0
+                        pending = pending[n:]
+                        got = True
+                if ch.recv_ready():   # 한 바퀴에 스트림별 1조각씩 → 어느 한쪽도 밀리지 않음
+                    _sink_feed(out, ch.recv(65536))
+                    got = True
+                if ch.recv_stderr_ready():
+                    _sink_feed(err, ch.recv_stderr(65536))
+                    got = True
+                now = time.time()
+                if timeout is not None and now - t0 > timeout:
+                    timed_out = "wall"
+                    break
+                if got:
+                    last = now
+                    continue
+                if ch.exit_status_ready() and not ch.recv_ready() and not ch.recv_stderr_ready():
+                    rc = ch.recv_exit_status()
+                    break
+                if idle_timeout is not None and now - last > idle_timeout:
+                    timed_out = "idle"
+                    break
+                time.sleep(STREAM_POLL_SEC)
+        finally:
+            _sink_feed(out, b"", final=True)
+            _sink_feed(err, b"", final=True)
+            ch.close()
+    return {
+        "rc": rc, "timed_out": timed_out, "elapsed": time.time() - t0,
+        "stdout": "\n".join(out["tail"]), "stderr": "\n".join(err["tail"]),
+        "stdout_lines": out["lines"], "stderr_lines": err["lines"], "bytes": out["bytes"] + err["bytes"],
+    }
+
+def run(conf: dict, cmd: str, timeout: float | None = None,
+        idle_timeout: float | None = None) -> tuple[int, str, str]:
+    """명령 1개 실행 → (rc, stdout, stderr). 제한 시간 초과는 TimeoutError."""
+    res = stream(conf, cmd, timeout=timeout, idle_timeout=idle_timeout)
+    if res["timed_out"]:
+        kind = "전체" if res["timed_out"] == "wall" else "무출력"
+        raise TimeoutError(f"명령 {kind} 제한 시간 초과({res['elapsed']:.1f}s): {cmd}\nSTDERR(끝부분):\n{res['stderr']}")
+    return res["rc"], res["stdout"], res["stderr"]
+
+
+# ======================= 준비 확인(probe) =======================
+# 원격 셸 조건식으로 바꿔 plan 안에서 폴링 → 확인마다 SSH 왕복이 생기지 않는다.
+#  {"kind": "process_gone", "pattern"}        pgrep -f 에 안 걸림
+#  {"kind": "port_closed" | "port_open", "port", "host"(기본 127.0.0.1)}
+#  {"kind": "http", "url", "status"(기본 200)} curl -k 응답 코드
+#  {"kind": "log_line", "path", "pattern"}    단계 명령 시작 이후 새로 쓰인 부분에 패턴(grep -E) 등장
+#                                             (파일이 기록 시점보다 작아지면 — 로테이션/truncate — 처음부터 다시 본다)
+# wait: {"probes": [...], "deadline": 초, "min": 초(선택, probe 가 먼저 참이어도 이만큼은 기다리는 하한)}
+def probe_desc(probe: dict) -> str:
+    k = probe["kind"]
+    if k == "process_gone":
+        return f"프로세스 종료({probe['pattern']})"
+    if k in ("port_closed", "port_open"):
+        return f"포트 {probe['port']} {'닫힘' if k == 'port_closed' else '열림'}"
+    if k == "http":
+        return f"HTTP {probe.get('status', 200)} ({probe['url']})"
+    if k == "log_line":
+        return f"로그 '{probe['pattern']}' ({probe['path']})"
+    raise ValueError(f"알 수 없는 probe: {k}")
+
+def probe_condition(probe: dict, offset_var: str | None = None) -> str:
+    k = probe["kind"]
+    if k == "process_gone":
+        return f"! pgrep -f -- {shlex.quote(probe['pattern'])} >/dev/null"
+    if k in ("port_closed", "port_open"):
+        dev = shlex.quote(f"</dev/tcp/{probe.get('host', '127.0.0.1')}/{int(probe['port'])}")
+        test = f"timeout 2 bash -c {dev} 2>/dev/null"
+        return f"! {test}" if k == "port_closed" else test
+    if k == "http":
+        code = f"$(curl -sk -o /dev/null -m 5 -w '%{{http_code}}' {shlex.quote(probe['url'])})"
+        return f"[ \"{code}\" = {int(probe.get('status', 200))} ]"
+    if k == "log_line":
+        path = shlex.quote(probe["path"])
+        return (f"{{ [ \"$(stat -L -c %s {path} 2>/dev/null || echo 0)\" -ge ${offset_var} ] || {offset_var}=0; "
+                f"tail -c +$(({offset_var} + 1)) {path} 2>/dev/null | grep -qE -- {shlex.quote(probe['pattern'])}; }}")
+    raise ValueError(f"알 수 없는 probe: {k}")
+
+def probe_delays(deadline: float) -> List[float]:
+    """PROBE_POLL_MIN 부터 PROBE_BACKOFF 배씩 늘린(상한 PROBE_POLL_MAX) 대기 간격, 합계가 deadline 을 덮을 때까지."""
+    delays, d, total = [], PROBE_POLL_MIN, 0.0
+    while total < deadline:
+        delays.append(round(d, 2))
+        total += d
+        d = min(d * PROBE_BACKOFF, PROBE_POLL_MAX)
+    return delays
+
+
+# ======================= 명령 묶음(plan) =======================
+# 여러 단계를 로그인 셸 1개(bash -l -s)에서 순서대로 실행하고, 단계 경계를 stdout/stderr 양쪽에
+# "@@PLAN <nonce> <번호> B <시각>@@" / "@@PLAN <nonce> <번호> E <시각> <rc>@@" 표시로 남겨 단계별 결과로 되돌린다.
+# (시각은 원격 기준 → 출력이 한 덩어리로 도착해도 단계별 소요 시간이 정확)
+# 단계에 "wait" 가 있으면 명령 뒤에 probe 들이 모두 참이 될 때까지(또는 deadline, min 하한) 폴링하고 W 표시로 결과를 남긴다.
+# check 단계가 실패하면 그 자리에서 중단(이후 단계 미실행) → 명령을 하나씩 실행하며 실패 시 멈추는 것과 같은 의미.
+_PLAN_MARK_RE = re.compile(r"^@@PLAN (\w+) (\d+) (B|E|W) ([\d.,]+)(?: (\d+))?@@$")
+_PLAN_NOW = "${EPOCHREALTIME:-$(date +%s)}"   # bash 5+ 는 fork 없이 마이크로초
+
+def _plan_wait_lines(i: int, wait: dict, nonce: str) -> tuple[List[str], List[str]]:
+    """(명령 전에 넣을 줄: 로그 크기 기록, 명령 뒤에 넣을 줄: 폴링 루프 + W 표시)"""
+    pre, conds = [], []
+    for j, probe in enumerate(wait["probes"]):
+        var = None
+        if probe["kind"] == "log_line":
+            var = f"o{i}_{j}"
+            pre.append(f"{var}=$(stat -L -c %s {shlex.quote(probe['path'])} 2>/dev/null || echo 0)")
+        conds.append(probe_condition(probe, var))
+    delays = " ".join(f"{d:g}" for d in probe_delays(float(wait["deadline"])))
+    post = [
+        f"ok=0; end=$((SECONDS + {int(wait['deadline']) + 1}))",   # SECONDS 는 정수 → 최소 deadline 보장
+        f"sleep {float(wait.get('min', 0)):g} & m=$!",   # 하한은 폴링과 동시에 흘려 보냄(probe 시간과 겹침)
+        f"for s in {delays} 0; do",
+        f"  if {' && '.join(conds)}; then ok=1; break; fi",
+        "  [ $SECONDS -ge $end ] && break",
+        "  sleep $s",
+        "done",
+        "wait $m",
+        f"printf '@@PLAN {nonce} {i} W %s %d@@\\n' {_PLAN_NOW} $ok",
+    ]
+    return pre, post
+
+def build_plan_script(steps: List[dict], nonce: str) -> str:
+    lines: List[str] = []
+    for i, st in enumerate(steps):
+        pre, post = _plan_wait_lines(i, st["wait"], nonce) if st.get("wait") else ([], [])
+        lines += pre + [
+            f"t={_PLAN_NOW}; printf '@@PLAN {nonce} {i} B %s@@\\n' $t; printf '@@PLAN {nonce} {i} B %s@@\\n' $t >&2",
+            f"( {st['cmd']}\n) </dev/null",   # 단계 명령이 stdin(=이 스크립트)을 읽지 않도록
+            f"rc=$?; t={_PLAN_NOW}",
+            f"printf '\\n@@PLAN {nonce} {i} E %s %d@@\\n' $t $rc; printf '\\n@@PLAN {nonce} {i} E %s %d@@\\n' $t $rc >&2",
+        ]
+        if st.get("check", True):
+            lines.append("[ $rc -eq 0 ] || exit 0")
+        lines += post
+        if st.get("sleep"):
+            lines.append(f"sleep {float(st['sleep']):g}")
+    lines.append("exit 0")
+    return "\n".join(lines) + "\n"
+
+def run_plan(conf: dict, steps: List[dict], timeout: float | None = None, idle_timeout: float | None = None,
+             on_step: Callable[[int, dict], None] | None = None,
+             on_wait: Callable[[int, dict, dict], None] | None = None, keep_lines: int = STREAM_KEEP_LINES) -> dict:
+    """
+    steps: [{"name", "cmd", "check"(기본 True), "sleep"(단계 후 대기 초), "echo"(출력 실시간 표시),
+             "wait": {"probes": [...], "deadline": 초}(명령 후 준비 확인)}]
+    on_step(i, step): 단계 시작 표시가 도착할 때 호출(단계별 진행 로그용).
+    on_wait(i, step, result): 준비 확인이 끝났을 때 호출(result["ready"], result["waited"]).
+    반환: {"results": [{"name", "rc", "stdout", "stderr", "elapsed", "ready", "waited"}](실행된 단계만),
+           "failed": 실패한 check 단계 번호 | None, "timed_out", "elapsed"}
+    """
+    nonce = secrets.token_hex(4)
+    results: List[dict] = []
+    cur = {"out": None, "err": None}
+    blank = {"out": 0, "err": 0}   # 빈 줄은 보류: 마지막 1줄은 종료 표시 앞에 넣은 개행
+
+    def _emit(kind: str, i: int, line: str):
+        results[i]["stdout" if kind == "out" else "stderr"].append(line)
+        if steps[i].get("echo"):
+            print(f"    {'|' if kind == 'out' else '!'} {line}")
+
+    def _on(kind: str, line: str):
+        m = _PLAN_MARK_RE.match(line)
+        i = cur[kind]
+        if m and m.group(1) == nonce:
+            n, t = int(m.group(2)), float(m.group(4).replace(",", "."))
+            if m.group(3) == "B":
+                while len(results) <= n:   # stdout/stderr 중 먼저 도착한 시작 표시에서 생성
+                    j = len(results)
+                    results.append({"name": steps[j]["name"], "rc": None, "t0": t, "t1": None, "elapsed": None,
+                                    "ready": None, "waited": None,
+                                    "stdout": deque(maxlen=keep_lines), "stderr": deque(maxlen=keep_lines)})
+                    if on_step is not None:
+                        on_step(j, steps[j])
+                cur[kind] = n
+            elif m.group(3) == "W":
+                if n < len(results) and results[n]["ready"] is None:
+                    r = results[n]
+                    r["ready"] = m.group(5) == "1"
+                    r["waited"] = max(0.0, t - (r["t1"] if r["t1"] is not None else r["t0"]))
+                    if on_wait is not None:
+                        on_wait(n, steps[n], r)
+            else:
+                if i is not None:
+                    for _ in range(blank[kind] - 1):
+                        _emit(kind, i, "")
+                if n < len(results) and results[n]["rc"] is None:
+                    results[n]["rc"] = int(m.group(5))
+                    results[n]["elapsed"] = max(0.0, t - results[n]["t0"])
+                    results[n]["t1"] = t
+                cur[kind] = None
+            blank[kind] = 0
+            return
+        if i is None:
+            return
+        if line == "":
+            blank[kind] += 1
+            return
+        for _ in range(blank[kind]):
+            _emit(kind, i, "")
+        blank[kind] = 0
+        _emit(kind, i, line)
+
+    res = stream(conf, "bash -l -s", on_stdout=lambda ln: _on("out", ln), on_stderr=lambda ln: _on("err", ln),
+                 timeout=timeout, idle_timeout=idle_timeout, keep_lines=10,
+                 stdin_data=build_plan_script(steps, nonce).encode("utf-8"))
+    failed = None
+    for i, r in enumerate(results):
+        r.pop("t0", None)
+        r.pop("t1", None)
+        r["stdout"] = "\n".join(r["stdout"])
+        r["stderr"] = "\n".join(r["stderr"])
+        if r["rc"] != 0 and steps[i].get("check", True) and failed is None:
+            failed = i
+    return {"results": results, "failed": failed, "timed_out": res["timed_out"], "elapsed": res["elapsed"]}
+
+
+# ======================= 파일 업로드 =======================
+# 원격 <파일>.part 에 이어 쓰고, 다 쓰면 sha256 확인 후 rename → 최종 이름은 항상 완전한 파일.
+# - 최종 파일의 sha256 이 로컬과 같으면 전송 생략(skip)
+# - .part 가 로컬 앞부분과 같으면(크기만큼의 sha256 비교) 그 뒤부터 이어서(resume), 다르면 처음부터(full)
+def _remote_hashes(conf: dict, remote_path: str) -> tuple[str | None, int, str | None]:
+    """(최종 파일 sha256 | None, .part 크기, .part sha256 | None) — 명령 1회."""
+    f, p = shlex.quote(remote_path), shlex.quote(remote_path + ".part")
+    cmd = (f"[ -f {f} ] && echo F $(sha256sum < {f}); "
+           f"[ -f {p} ] && echo P $(stat -c %s {p}) $(sha256sum < {p}); true")
+    _, out, _ = run(conf, cmd, timeout=600)
+    final, part_size, part_hash = None, 0, None
+    for line in out.splitlines():
+        w = line.split()
+        if len(w) >= 2 and w[0] == "F":
+            final = w[1]
+        elif len(w) >= 3 and w[0] == "P" and w[1].isdigit():
+            part_size, part_hash = int(w[1]), w[2]
+    return final, part_size, part_hash
+
+def _local_hashes(local_path: str, prefix: int) -> tuple[str, str | None]:
+    """(전체 sha256, 앞 prefix 바이트 sha256 | None) — 로컬 파일 1회 읽기."""
+    h, pre, pos = hashlib.sha256(), None, 0
+    with open(local_path, "rb") as f:
+        while True:
+            want = UPLOAD_CHUNK if pre is not None or prefix <= 0 else min(UPLOAD_CHUNK, prefix - pos)
+            chunk = f.read(want)
+            if not chunk:
+                break
+            h.update(chunk)
+            pos += len(chunk)
+            if pre is None and 0 < prefix == pos:
+                pre = h.copy().hexdigest()
+    return h.hexdigest(), pre
+
+def upload(conf: dict, local_path: str, remote_path: str,
+           on_progress: Callable[[int, int], None] | None = None) -> dict:
+    """
+    local_path → remote_path(전체 경로). 반환:
+    {"action": "skip"|"resume"|"full", "sha256", "size", "offset"(이어 쓴 시작 위치), "sent", "elapsed", "mbps"}
+    """
+    size = os.path.getsize(local_path)
+    t0 = time.time()
+    with timed(conf):
+        final, part_size, part_hash = _remote_hashes(conf, remote_path)
+    digest, prefix_hash = _local_hashes(local_path, part_size if 0 < part_size <= size else 0)
+    res = {"action": "full", "sha256": digest, "size": size, "offset": 0, "sent": 0}
+    if final == digest:
+        res.update(action="skip", elapsed=time.time() - t0, mbps=0.0)
+        return res
+    if part_hash is not None and part_hash == prefix_hash:
+        res.update(action="resume", offset=part_size)
+
+    part = remote_path + ".part"
+    t1 = time.time()
+    with timed(conf):
+        sftp = paramiko.SFTPClient.from_transport(get_client(conf).get_transport(), window_size=UPLOAD_WINDOW)
+        try:
+            with open(local_path, "rb") as src, sftp.open(part, "ab" if res["offset"] else "wb") as dst:
+                dst.set_pipelined(True)   # 쓰기마다 응답을 기다리지 않음(close 때 한꺼번에 확인)
+                src.seek(res["offset"])
+                pos = res["offset"]
+                while True:
+                    chunk = src.read(UPLOAD_CHUNK)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    pos += len(chunk)
+                    if on_progress is not None:
+                        on_progress(pos, size)
+            res["sent"] = size - res["offset"]
+            send_sec = time.time() - t1
+            _, out, _ = run(conf, f"sha256sum < {shlex.quote(part)}", timeout=600)
+            if out.split()[:1] != [digest]:
+                sftp.remove(part)   # 이어 쓴 결과가 어긋남 → 다음 시도는 처음부터
+                raise RuntimeError(f"업로드 검증 실패(sha256 불일치): {remote_path}")
+            sftp.posix_rename(part, remote_path)   # 기존 파일이 있어도 원자적으로 교체
+        finally:
+            sftp.close()
+    res.update(elapsed=time.time() - t0, mbps=res["sent"] / max(send_sec, 1e-6) / (1024 * 1024))
+    return res
+
+
+# ======================= 통계 =======================
+def session_report() -> List[str]:
+    with _LOCK:
+        ents = list(_SESSIONS.values())
+    lines = []
+    for ent in ents:
+        st = ent["stats"]
+        lines.append(
+            f"  - {ent['key']}: 접속 {st['connects']}회(재접속 {st['reconnects']}) "
+            f"TCP {st['tcp_sec']:.2f}s + 키교환/인증 {st['auth_sec']:.2f}s, "
+            f"명령 {st['commands']}회 {st['command_sec']:.2f}s"
+        )
+    return lines
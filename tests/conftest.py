@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import pathlib
+import runpy
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def err_log(tmp_path_factory):
+    """err_log 모듈. 모듈 끝의 excel.py 실행(runpy)은 막고 import, 상태 파일은 임시 디렉터리로."""
+    for name in ("paramiko", "openpyxl", "yaml", "requests"):
+        pytest.importorskip(name)
+    run_path = runpy.run_path
+    runpy.run_path = lambda *a, **k: None
+    try:
+        import err_log
+    finally:
+        runpy.run_path = run_path
+    err_log._note = lambda msg: None
+    state = tmp_path_factory.mktemp("state")
+    for name in ("CURSOR_STORE_PATH", "LOG_RESOLVE_PATH", "EVENT_DB_PATH", "RATE_SERIES_PATH", "AI_CACHE_PATH"):
+        setattr(err_log, name, str(state / pathlib.Path(getattr(err_log, name)).name))
+    return err_log
+
+
+class _Channel:
+    def __init__(self, rc):
+        self.rc = rc
+
+    def recv_exit_status(self):
+        return self.rc
+
+
+class _Stream:
+    def __init__(self, data, rc):
+        self.data = data
+        self.channel = _Channel(rc)
+
+    def read(self):
+        return self.data
+
+
+class LocalClient:
+    """exec_command 를 로컬 bash 로 실행하는 SSHClient 대용(원격 셸 명령 검증용)."""
+
+    def exec_command(self, cmd, **kwargs):
+        p = subprocess.run(["bash", "-c", cmd], capture_output=True)
+        return None, _Stream(p.stdout, p.returncode), _Stream(p.stderr, p.returncode)
+
+
+@pytest.fixture
+def local_cli():
+    return LocalClient()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+
+import pytest
+
+
+def _run(err_log, d, digest):
+    cmd = err_log.build_agent_cmd(str(d), digest)
+    return subprocess.run(["bash", "-c", cmd], input=b"{}", capture_output=True).returncode
+
+
+def _agent_dir(tmp_path, data, mode=0o700):
+    d = tmp_path / "agent"
+    d.mkdir()
+    (d / "log_agent.py").write_bytes(data)
+    os.chmod(d, mode)
+    return d
+
+
+@pytest.mark.parametrize("tamper, mode", [(b"#x\n", 0o700), (b"", 0o777)])
+def test_agent_refused_and_removed(err_log, tmp_path, tamper, mode):
+    data, digest = err_log.agent_script()
+    d = _agent_dir(tmp_path, data + tamper, mode)
+    assert _run(err_log, d, digest) == err_log._AGENT_VERIFY_RC
+    assert not d.exists()
+
+
+def test_agent_symlink_refused(err_log, tmp_path):
+    data, digest = err_log.agent_script()
+    d = _agent_dir(tmp_path, data)
+    (d / "log_agent.py").unlink()
+    (d / "log_agent.py").symlink_to(err_log.AGENT_LOCAL_PATH)
+    assert _run(err_log, d, digest) == err_log._AGENT_VERIFY_RC
+
+
+def test_agent_verified_runs_and_removed(err_log, tmp_path):
+    data, digest = err_log.agent_script()
+    d = _agent_dir(tmp_path, data)
+    assert _run(err_log, d, digest) not in (err_log._AGENT_VERIFY_RC, err_log._AGENT_NOPY_RC)
+    assert not d.exists()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+NOW = datetime(2026, 10, 18, 12, 1, 0)
+
+
+def _npe_log(count, first_line):
+    out = []
+    for i in range(count):
+        out.append(f"2026-10-18 12:00:{10 + i:02d},{i:03d} ERROR [exec-{i + 3}] c.d.s.web.X - request {first_line + i} failed")
+        out.append("java.lang.NullPointerException: null")
+        out.append(f"\tat com.dbsafer.web.X.run(X.java:{first_line + i})")
+    return out
+
+
+def _analyze(err_log, lines, fkey):
+    return err_log.analyze_collected("/logs/catalina.out", {"lines": lines, "context": []}, NOW, fkey)
+
+
+def test_same_incident_with_different_count_shares_key(err_log):
+    a = _analyze(err_log, _npe_log(3, 100), "h|a")
+    b = _analyze(err_log, _npe_log(5, 700), "h|b")
+    assert a["ai_prompt"] and b["ai_prompt"]
+    assert a["ai_prompt"] != b["ai_prompt"]
+    assert err_log.ai_row_key(a) == err_log.ai_row_key(b)
+
+
+def _ora_log(code, count):
+    return [f"2026-10-18 12:00:{10 + i:02d},000 ERROR [exec-{i}] c.d.s.db.Dao - java.sql.SQLException: "
+            f"ORA-{code}: query failed" for i in range(count)]
+
+
+def test_different_ora_codes_get_different_keys(err_log):
+    a = _analyze(err_log, _ora_log("00942", 3), "h|c")
+    b = _analyze(err_log, _ora_log("01017", 3), "h|d")
+    assert err_log.ai_row_key(a) != err_log.ai_row_key(b)
+    c = _analyze(err_log, _ora_log("00942", 6), "h|e")
+    assert err_log.ai_row_key(a) == err_log.ai_row_key(c)
+
+
+def test_different_rule_category_changes_key(err_log):
+    key = err_log.ai_template_key
+    assert key("/x.log", ["ERROR <*> failed"], ["APP"], []) != key("/x.log", ["ERROR <*> failed"], ["DB"], [])
+
+
+def test_prompt_fingerprint_ignores_counts_and_examples(err_log):
+    a = "로그 파일: /x\n샘플:\n[x3] ERROR request <NUM> failed  (예: 101 / 102)"
+    b = "로그 파일: /x\n샘플:\n[x12] ERROR request <NUM> failed  (예: 7 / 9)"
+    assert err_log.ai_fingerprint(a) == err_log.ai_fingerprint(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("ORA-00942: table or view does not exist", "ORA-01017: table or view does not exist"),
+    ("HTTP status 404 from /webreport", "HTTP status 503 from /webreport"),
+    ("java.net.SocketTimeoutException: Read timed out", "java.net.ConnectException: Read timed out"),
+])
+def test_fingerprint_keeps_distinguishing_codes(err_log, a, b):
+    assert err_log.ai_fingerprint(a) != err_log.ai_fingerprint(b)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+ANSWER = (
+    "[상태] 핵심 에러 반복\n"
+    "[의심 원인] - DB 계정 잠김\n"
+    "[즉시 점검] - 계정 상태 확인\n"
+    "[다음 조치] - 계정 잠금 해제\n"
+    "- 접속 풀 재시작\n"
+    "참고로 위 내용은 로그만으로 판단했습니다.\n"
+    "추가 설명 ...\n"
+)
+
+
+class _Chunks:
+    """조각을 건네며 몇 개까지 소비됐는지/닫혔는지 기록."""
+
+    def __init__(self, text, size):
+        self.parts = [text[i:i + size] for i in range(0, len(text), size)]
+        self.taken = 0
+        self.closed = False
+
+    def __iter__(self):
+        for part in self.parts:
+            self.taken += 1
+            yield part
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_keeps_multi_line_next_action_block(err_log):
+    chunks = _Chunks(ANSWER, 7)
+    out = err_log.sanitize_ai_stream(chunks)
+    assert out.splitlines() == ANSWER.splitlines()[:5]
+    assert chunks.closed
+    assert chunks.taken < len(chunks.parts)
+
+
+def test_stream_stops_at_new_section_after_next_action(err_log):
+    text = "[상태] a\n[의심 원인] - b\n[즉시 점검] - c\n[다음 조치] - d\n[상태] 반복된 블록\n"
+    assert err_log.sanitize_ai_stream(iter([text])).splitlines() == text.splitlines()[:4]
+
+
+def test_abort_answer_has_all_four_blocks(err_log):
+    lines = ["2026-10-18 12:00:10,000 SEVERE java.lang.OutOfMemoryError: Java heap space"]
+    row = err_log.analyze_collected("/logs/catalina.out", {"lines": lines, "context": []},
+                                    datetime(2026, 10, 18, 12, 1, 0), "h|abort")
+    labels = [ln.split("]")[0] + "]" for ln in row["chatgpt_answer"].splitlines()]
+    assert labels == list(err_log._AI_LABELS)
+    assert err_log.sanitize_ai_stream(iter([row["chatgpt_answer"]])) == row["chatgpt_answer"]
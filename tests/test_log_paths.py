@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import os
+
+
+def _cache(err_log, hkey, path, ino=None):
+    store = err_log._log_path_store()
+    ino = ino or str(os.stat(path).st_ino)
+    store[hkey] = {"sig": "s", "ts": 0, "chosen": [{"tag": "t", "path": str(path), "ino": ino}]}
+    return store
+
+
+def _check(err_log, cli, hkey, path):
+    collected = err_log.collect_log(cli, str(path), None, None, hkey, "tail")
+    err_log.check_resolved_paths(hkey, [str(path)], [(collected, [])])
+    return collected
+
+
+def test_empty_log_keeps_path_cache(err_log, local_cli, tmp_path):
+    path = tmp_path / "empty.log"
+    path.write_text("")
+    store = _cache(err_log, "h-empty", path)
+    for _ in range(2):
+        collected = _check(err_log, local_cli, "h-empty", path)
+        assert collected["lines"] == [] and collected["size"] == 0
+        assert "h-empty" in store
+
+
+def test_empty_log_with_new_inode_drops_path_cache(err_log, local_cli, tmp_path):
+    path = tmp_path / "empty.log"
+    path.write_text("")
+    store = _cache(err_log, "h-new", path, ino="0")
+    _check(err_log, local_cli, "h-new", path)
+    assert "h-new" not in store
+
+
+def test_missing_log_drops_path_cache(err_log, local_cli, tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("")
+    store = _cache(err_log, "h-gone", path)
+    path.unlink()
+    assert _check(err_log, local_cli, "h-gone", path) is None
+    assert "h-gone" not in store
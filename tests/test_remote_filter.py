@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+LOG = [
+    "2026-10-18 11:50:00,000 ERROR old event outside window",
+    "2026-10-18 12:00:01,000 INFO [exec-1] c.d.s.Dao - query failed",
+    "java.sql.SQLException: ORA-01017: invalid username/password; logon denied",
+    "\tat oracle.jdbc.driver.T4CTTIoer.processError(T4CTTIoer.java:445)",
+    "2026-10-18 12:00:02,000 INFO fine",
+    "2026-10-18 12:00:03,000 ERROR [exec-2] boom",
+    "java.lang.IllegalStateException: x",
+    "\tat a.b.C(C.java:1)",
+    "Caused by: java.net.ConnectException: Connection refused",
+    "\t... 12 more",
+    "2026-10-18 12:00:04,000 INFO tail 1",
+]
+NOW = datetime(2026, 10, 18, 12, 1, 0)
+
+
+def _collect(err_log, cli, path, mode):
+    collected = err_log.collect_log(cli, str(path), None, NOW, "h", mode)
+    return err_log.analyze_collected(str(path), collected, NOW, f"h|{mode}|{path}")
+
+
+def test_remote_filter_keeps_continuation_lines(err_log, local_cli, tmp_path):
+    path = tmp_path / "catalina.out"
+    path.write_text("\n".join(LOG) + "\n")
+    got = err_log.read_remote_filtered(local_cli, str(path), NOW)
+    assert got["lines"] == LOG[1:4] + LOG[5:10]
+
+
+def test_remote_filter_matches_local_mode(err_log, local_cli, tmp_path):
+    path = tmp_path / "catalina.out"
+    path.write_text("\n".join(LOG) + "\n")
+    local = _collect(err_log, local_cli, path, "tail")
+    remote = _collect(err_log, local_cli, path, "remote_filter")
+    assert "ORA-01017" in local["core_samples"]
+    assert remote["core_samples"] == local["core_samples"]
+    assert remote["chatgpt_answer"] == local["chatgpt_answer"]